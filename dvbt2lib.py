@@ -14,16 +14,171 @@ Convention des axes retard-Doppler
 # https://docs.python.org/fr/3/tutorial/classes.html
 # https://matplotlib.org/stable/gallery/color/color_cycle_default.html
 
+# matplotlib et scipy sont importés à la première utilisation (tracés, fenêtres, fonctions spéciales, FFT), cf. bench_import
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib import colors
-from matplotlib import cm
-from scipy import signal, special
-import random as rd
 import os
+import sys
+import time
+import tracemalloc
+import functools
+import subprocess
+import tempfile
+import multiprocessing as mp
+import sqlite3
+import hashlib
+import json
+import shutil
+
+__version__="1.1"
 
 epsZF=1e-10
 
+rdmBlock=2**26 # mémoire en octets d'un bloc de lignes de RDM (métriques, RDM hors mémoire)
+
+# cache disque des grilles (fichiers .npy projetés en mémoire), désactivé si gridCacheDir=""
+gridCacheDir=os.environ.get("DVBT2_CACHE",os.path.join(os.path.expanduser("~"),".cache","dvbt2"))
+gridCacheSize=2**30 # taille max. du cache en octets, les grilles les moins récemment utilisées sont supprimées
+
+# transformées de Fourier, cf. fft_backend
+_fftConf={"lib":"scipy","mod":None,"workers":int(os.environ.get("DVBT2_FFT_WORKERS",1))}
+
+def fft_backend(lib="scipy",workers=None):
+    """
+    @brief Choix de la bibliothèque des FFT de la chaîne
+    @details scipy.fft (défaut) conserve la précision simple et répartit les FFT en lot sur workers threads ; pyfftw (si installé, scipy sinon) garde en cache les plans FFTW ; numpy est mono-thread et calcule en double précision
+    @param lib "scipy", "pyfftw" ou "numpy"
+    @param workers nombre de threads, -1 pour tous les cœurs, inchangé si None (défaut), 1 au départ ou la variable d'environnement DVBT2_FFT_WORKERS
+    @return le nom de la bibliothèque utilisée
+    """
+    if workers is not None:
+        _fftConf["workers"]=workers
+    from scipy import fft as mod
+    if lib=="pyfftw":
+        try:
+            import pyfftw
+            import pyfftw.interfaces.scipy_fft as mod
+            pyfftw.interfaces.cache.enable()
+            pyfftw.interfaces.cache.set_keepalive_time(60)
+        except ImportError:
+            lib="scipy"
+    elif lib=="numpy":
+        mod=np.fft
+    elif lib!="scipy":
+        print("La bibliothèque FFT *%s* n'est pas implémentée" % lib)
+        lib="scipy"
+    _fftConf["lib"]=lib
+    _fftConf["mod"]=mod
+    return lib
+
+def _fft(x,axis=-1,overwrite=False):
+    """FFT selon axis, x peut être écrasé si overwrite"""
+    if _fftConf["mod"] is None:
+        fft_backend(_fftConf["lib"])
+    if _fftConf["lib"]=="numpy":
+        return np.fft.fft(x,axis=axis).astype(np.result_type(x.dtype,np.complex64),copy=False)
+    return _fftConf["mod"].fft(x,axis=axis,overwrite_x=overwrite,workers=_fftConf["workers"])
+
+def _ifft(x,axis=-1,overwrite=False):
+    """IFFT selon axis, x peut être écrasé si overwrite"""
+    if _fftConf["mod"] is None:
+        fft_backend(_fftConf["lib"])
+    if _fftConf["lib"]=="numpy":
+        return np.fft.ifft(x,axis=axis).astype(np.result_type(x.dtype,np.complex64),copy=False)
+    return _fftConf["mod"].ifft(x,axis=axis,overwrite_x=overwrite,workers=_fftConf["workers"])
+
+# profilage des étapes de la chaîne, cf. profile_start
+_prof={"on":False,"mem":False,"key":"","depth":0,"data":{}}
+
+class _stage():
+    """Contexte de mesure (temps, pic mémoire) de l'étape name si le profilage est actif, seule l'étape la plus externe est comptée"""
+    __slots__=("name","top","t0","m0")
+
+    def __init__(self,name):
+        self.name=name
+
+    def __enter__(self):
+        self.top=_prof["on"]==True and _prof["depth"]==0
+        _prof["depth"]+=1
+        if self.top==True:
+            if _prof["mem"]==True:
+                tracemalloc.reset_peak()
+                self.m0=tracemalloc.get_traced_memory()[0]
+            self.t0=time.perf_counter()
+        return self
+
+    def __exit__(self,*exc):
+        _prof["depth"]-=1
+        if self.top==True:
+            t=time.perf_counter()-self.t0
+            m=tracemalloc.get_traced_memory()[1]-self.m0 if _prof["mem"]==True else 0
+            s=_prof["data"].setdefault(_prof["key"],{}).setdefault(self.name,[0,0.,0])
+            s[0]+=1
+            s[1]+=t
+            s[2]=max(s[2],m)
+        return False
+
+def _staged(name):
+    """Décorateur de profilage de l'étape name, appel direct si le profilage est inactif"""
+    def deco(f):
+        @functools.wraps(f)
+        def g(*args,**kwargs):
+            if _prof["on"]==False:
+                return f(*args,**kwargs)
+            with _stage(name):
+                return f(*args,**kwargs)
+        return g
+    return deco
+
+def profile_start(mem=False):
+    """
+    @brief Activation du profilage des étapes Param, Grid, Signal, add_target, add_noise, Rdm, pislr, pislrTheo
+    @param mem pour les pics mémoire (tracemalloc, plus lent), False par défaut
+    """
+    _prof.update(on=True,mem=mem,depth=0,data={},key="")
+    if mem==True and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def profile_stop():
+    """
+    @brief Arrêt du profilage
+    @return les mesures {clé:{étape:[nbre d'appels,temps total en s,pic mémoire en octets]}}, la clé est fixée par simul_task (mode et configuration), "" hors simul
+    """
+    data=_prof["data"]
+    if _prof["mem"]==True:
+        tracemalloc.stop()
+    _prof.update(on=False,mem=False,data={},key="")
+    return data
+
+def profile_merge(data,new):
+    """@brief Ajout des mesures new (cf. profile_stop) à data"""
+    for key,v in new.items():
+        for k,(n,t,m) in v.items():
+            s=data.setdefault(key,{}).setdefault(k,[0,0.,0])
+            s[0]+=n
+            s[1]+=t
+            s[2]=max(s[2],m)
+    return data
+
+def profile_report(data,fichOut=""):
+    """
+    @brief Tableau des mesures par configuration puis par mode de simul
+    @param data les mesures (cf. profile_stop)
+    @param fichOut fichier JSON du rapport, "" (défaut) sans écriture
+    @return les totaux par mode
+    """
+    tot={}
+    for key,v in data.items():
+        profile_merge(tot,{key.split()[0] if key else "":v})
+    for d in (data,tot):
+        print(f'{"":36} {"étape":10} {"appels":>7} {"total s":>9} {"moy. ms":>9} {"pic Mo":>8}')
+        for key,v in d.items():
+            for k,(n,t,m) in sorted(v.items(),key=lambda i:-i[1][1]):
+                print(f'{key:36} {k:10} {n:7d} {t:9.3f} {1e3*t/n:9.2f} {m/2**20:8.1f}')
+    if fichOut!="":
+        with open(fichOut,"w") as f:
+            json.dump({"configs":data,"sim":tot},f,indent=1)
+    return tot
+
 # combinaison GI-PP table 59 et PP-CP G.1
 configIn=(
     ((1024,),(1/16,),("PP4","PP5"),("CP1",)),
@@ -88,13 +243,48 @@ def all_config(config=configIn):
 
 # [(i,all_config()[i]) for i in range(len(all_config()))]
 
+def seed_seq(seed=-1):
+    """
+    @brief Séquence de graines numpy associée à seed
+    @param seed -1 pour une nouvelle entropie, entier >=0, SeedSequence ou Generator
+    @return instance np.random.SeedSequence
+    """
+    if isinstance(seed,np.random.SeedSequence):
+        return seed
+    if isinstance(seed,np.random.Generator):
+        return seed.bit_generator.seed_seq
+    if seed==-1:
+        return np.random.SeedSequence()
+    return np.random.SeedSequence(seed)
+
+def seed_child(seed,*key):
+    """
+    @brief Graine fille indépendante repérée par key, par ex. (config,) puis (config,point) puis (config,point,tirage)
+    @details La graine fille ne dépend que de la graine mère et de key, pas de l'ordre des appels : les tirages sont les mêmes en série ou répartis sur plusieurs processus
+    @param seed graine mère, cf. seed_seq
+    @param key indices entiers
+    @return instance np.random.SeedSequence
+    """
+    ss=seed_seq(seed)
+    return np.random.SeedSequence(ss.entropy,spawn_key=ss.spawn_key+tuple(int(i) for i in key),pool_size=ss.pool_size)
+
+def rng_of(seed=-1):
+    """
+    @brief Générateur pseudo-aléatoire numpy associé à seed
+    @param seed -1 pour une nouvelle séquence, entier >=0, SeedSequence ou Generator (utilisé tel quel)
+    @return instance np.random.Generator
+    """
+    if isinstance(seed,np.random.Generator):
+        return seed
+    return np.random.default_rng(seed_seq(seed))
+
 class Param():
     """
     @brief Les paramètres temps, fréquence, mode de l'émetteur DVBT2 (ETSI TS 102 755 v1.1.1), plus quelques paramètres de flexibilité
     @param _TU  time unit, la période d'échantillonnage en s., table 66 de la spec.
     """
     _TU=7e-6/64
-    def __init__(self,FFT=1024,GI=1/4,PP='PP1',CP='CP1',MOD='QPSK',boostP=1,boostD=1,seed=-1):
+    def __init__(self,FFT=1024,GI=1/4,PP='PP1',CP='CP1',MOD='QPSK',boostP=1,boostD=1,seed=-1,prec="double"):
         """
         @brief Initialisation des paramètres et mode DVBT2
         @param FFT FFT size, le mode de la spec., table 56
@@ -104,7 +294,10 @@ class Param():
         @param MOD modulation des datas, chaine de caractères, par défaut 'QPSK', table 12
         @param boostP coefficient d'amplitude de tous les pilotes, 1 par défaut, paramètre hors spec.
         @param boostD coefficient d'amplitude des datas, 1 par défaut, paramètre hors spec.
-        @param seed nouvelle séquence pseudo si seed=-1 (par défaut), initialisation des géné. pseudo si seed>=0, paramèter hors spec.
+        @param seed nouvelle séquence pseudo si seed=-1 (par défaut), initialisation du géné. pseudo si seed>=0, SeedSequence ou Generator, paramèter hors spec.
+        @param prec précision des calculs, "double" (complex128, par défaut) ou "single" (complex64, cf. check_prec), paramètre hors spec.
+        @return rng attribut générateur pseudo-aléatoire (np.random.Generator) utilisé par défaut par Signal et add_noise
+        @return dtype,rdtype attributs types numpy complexe et réel des signaux
         """
         #self.TU=TU
         self.FFT=FFT
@@ -115,6 +308,12 @@ class Param():
         self.boostP=boostP
         self.boostD=boostD
         self.seed=seed
+        self.rng=rng_of(seed)
+        self.prec=prec
+        if prec=="single":
+            self.dtype,self.rdtype=np.complex64,np.float32
+        else:
+            self.dtype,self.rdtype=np.complex128,np.float64
         
     def update(self,F=550e6):
         """
@@ -300,46 +499,153 @@ def fmod(mod):
         print("La modulation *%s* n'est pas implémentée" % mod)
     return symb.flatten()
 
+def cache_key(p):
+    """
+    @brief Clé du cache disque d'une grille, la grille ne dépend que de (FFT,GI,PP,CP)
+    @param p instance Param mise à jour
+    @return la clé, préfixe des noms de fichiers du cache
+    """
+    return f"grid_{p.FFT}_{float(p.GI)!r}_{p.PP}_{p.CP}_v{__version__}"
+
+def cache_load(key,names):
+    """
+    @brief Lecture d'une entrée du cache disque, les tableaux sont projetés en mémoire en lecture seule
+    @param key la clé de l'entrée
+    @param names les noms des tableaux de l'entrée
+    @return le dictionnaire nom:tableau, None si l'entrée est absente ou incomplète
+    """
+    out={}
+    try:
+        for n in names:
+            f=os.path.join(gridCacheDir,f"{key}.{n}.npy")
+            out[n]=np.load(f,mmap_mode="r")
+            # date de modification = date du dernier accès pour l'éviction, sans effet sur un cache en lecture seule
+            try:
+                os.utime(f)
+            except OSError:
+                pass
+    except (OSError,ValueError):
+        return None
+    return out
+
+def cache_store(key,arrays):
+    """
+    @brief Écriture d'une entrée dans le cache disque puis éviction si la taille max. est dépassée
+    @details L'écriture passe par un fichier temporaire renommé, plusieurs processus peuvent partager le cache
+    @param key la clé de l'entrée
+    @param arrays le dictionnaire nom:tableau
+    """
+    try:
+        os.makedirs(gridCacheDir,exist_ok=True)
+        for n,a in arrays.items():
+            f=os.path.join(gridCacheDir,f"{key}.{n}.npy")
+            tmp=f"{f}.{os.getpid()}.tmp"
+            with open(tmp,"wb") as fh:
+                np.save(fh,a)
+            os.replace(tmp,f)
+        cache_evict(keep=key)
+    except OSError:
+        # cache en lecture seule ou disque plein, la grille reste utilisable
+        pass
+
+def cache_evict(size=None,keep=""):
+    """
+    @brief Suppression des entrées les moins récemment utilisées jusqu'à ce que le cache tienne dans size octets
+    @param size taille max. en octets, gridCacheSize par défaut, 0 pour vider le cache
+    @param keep clé d'une entrée à conserver
+    """
+    if size is None:
+        size=gridCacheSize
+    entries={}
+    try:
+        with os.scandir(gridCacheDir) as it:
+            for e in it:
+                if e.name.startswith("grid_") and e.name.endswith(".npy"):
+                    st=e.stat()
+                    k=e.name.split(".npy")[0].rsplit(".",1)[0]
+                    t,n,l=entries.get(k,(0,0,[]))
+                    entries[k]=(max(t,st.st_mtime),n+st.st_size,l+[e.path])
+    except OSError:
+        return
+    total=sum(i[1] for i in entries.values())
+    for k,(t,n,l) in sorted(entries.items(),key=lambda i:i[1][0]):
+        if total<=size:
+            break
+        if k==keep:
+            continue
+        for f in l:
+            try:
+                os.remove(f)
+            except OSError:
+                pass
+        total=total-n
+
 class Grid():
     """
     @brief Les positions des pilotes et des datas de la trame T2 dans la grille temps-fréquence (ETSI TS 102 755 v1.1.1)
     """
     
-    def __init__(self,p):
+    @_staged("Grid")
+    def __init__(self,p,cache=True):
         """
         @brief Génération et affectation de la grille temps-fréquence : données, pilotes dispersés, continus, de bord et porteuses nulles
+        @details Si gridCacheDir n'est pas vide, la grille est lue (projetée en mémoire, lecture seule) dans le cache disque ou y est écrite
         @param p passage d'une instance de la classe Param
+        @param cache utilisation du cache disque, True par défaut
         @return mat attribut grille temps-fréquence avec identificateur données, pilotes...
         @return nbD attribut nombre de données
         @return nbSP attribut nombre de pilotes dispersés
         @return nbCP attribut nombre de pilotes continus
         @return nbEP attribut nombre de pilotes de bord
         @return nbNP attribut nombre de sous-porteuses nulles
+        @return idxD,idxSP,idxCP,idxEP attributs indices croissants dans mat.reshape(-1) des données, pilotes dispersés, continus et de bord
         """
         self.p=p
-        self.mat=4*np.ones((self.p.LF,self.p.FFT))
-        # scattered
-        for l in range(0,self.p.LF):
-            for k in range(self.p.Kmin+1,self.p.Kmax):
-                if k%(self.p.Dx*self.p.Dy)==self.p.Dx*(l%self.p.Dy):
-                    self.mat[l,k]=3
+        cache=cache and gridCacheDir!=""
+        if cache:
+            key=cache_key(p)
+            z=cache_load(key,("mat","nb","idxD","idxSP","idxCP","idxEP"))
+            if z is not None:
+                self.mat=z["mat"]
+                self.nbNP,self.nbEP,self.nbCP,self.nbSP,self.nbD=(int(i) for i in z["nb"])
+                self.idxD,self.idxSP,self.idxCP,self.idxEP=z["idxD"],z["idxSP"],z["idxCP"],z["idxEP"]
+                return
+        self.build()
+        if cache:
+            cache_store(key,{"mat":self.mat,"nb":np.array([self.nbNP,self.nbEP,self.nbCP,self.nbSP,self.nbD]),
+                             "idxD":self.idxD,"idxSP":self.idxSP,"idxCP":self.idxCP,"idxEP":self.idxEP})
+
+    def build(self):
+        """@brief Construction de la grille sans passer par le cache"""
+        # motif élémentaire : la ligne l de la grille est la ligne l%Dy du motif
+        nR=min(self.p.Dy,self.p.LF)
+        row=np.full((nR,self.p.FFT),4,dtype=np.int8)
+        # scattered, k%(Dx*Dy)==Dx*(l%Dy) pour Kmin<k<Kmax
+        DxDy=self.p.Dx*self.p.Dy
+        for r in range(min(nR,-(-self.p.Kmax//self.p.Dx))):
+            k0=self.p.Dx*r
+            if k0<self.p.Kmin+1:
+                k0=k0+DxDy*(-(-(self.p.Kmin+1-k0)//DxDy))
+            row[r,k0:self.p.Kmax:DxDy]=3
         # continual
-        for i in self.p.k32K:
-            self.mat[:,i%self.p.Kmod]=2
+        row[:,np.array(self.p.k32K,dtype=int)%self.p.Kmod]=2
         # edge
-        if p.CP!="CP0":
-            self.mat[:,self.p.Kmin]=1
-            self.mat[:,self.p.Kmax]=1
+        if self.p.CP!="CP0":
+            row[:,self.p.Kmin]=1
+            row[:,self.p.Kmax]=1
         # null
-        self.mat[:,:self.p.Kmin]=0
-        self.mat[:,self.p.Kmax+1:]=0
+        row[:,:self.p.Kmin]=0
+        row[:,self.p.Kmax+1:]=0
         # décommenter pour avoir un signal en bande de base, sinon analytique
-        #self.mat=np.fft.fftshift(self.mat)
-        self.nbD=np.count_nonzero(self.mat==4)
-        self.nbSP=np.count_nonzero(self.mat==3)
-        self.nbCP=np.count_nonzero(self.mat==2) # len(self.p.k32K)*self.p.LF
-        self.nbEP=np.count_nonzero(self.mat==1) # 2*self.p.LF
-        self.nbNP=np.count_nonzero(self.mat==0) # (self.p.Kmin+self.p.FFT-self.p.Kmax-1)*self.p.LF
+        #row=np.fft.fftshift(row,axes=1)
+        l=np.arange(self.p.LF)%nR
+        self.mat=row[l]
+        # comptage sur le motif pondéré par le nombre de répétitions de chaque ligne
+        nb=np.bincount(l,minlength=nR)@np.array([np.bincount(i,minlength=5) for i in row])
+        self.nbNP,self.nbEP,self.nbCP,self.nbSP,self.nbD=(int(i) for i in nb[:5])
+        # indices par classe : un tri stable (tri par base sur int8) range les indices croissants classe par classe
+        idx=np.split(np.argsort(self.mat.reshape(-1),kind="stable"),np.cumsum(nb[:4]))
+        self.idxEP,self.idxCP,self.idxSP,self.idxD=(np.copy(i) for i in idx[1:])
     
     def test():
         # exécuter Grid.test() mais pas très orthodoxe !
@@ -353,6 +659,8 @@ class Grid():
 
     def show(self,carrierMin=0,carrierMax=0,symbMin=0,symbMax=0):
         """@brief Affichage de la grille temps-fréquence sur les coordonnées (carrierMin,carrierMax,symbMin,symbMax), par défaut toute la matrice"""
+        import matplotlib.pyplot as plt
+        from matplotlib import colors
         plt.figure(dpi=300)
         #plt.rcParams["figure.dpi"]=300 # pour le prompt
         if carrierMax==0:
@@ -365,27 +673,118 @@ class Grid():
         cb=plt.colorbar()
         cb.set_ticks(ticks=[0.5,1.5,2.5,3.5,4.5], labels=["porteuse nulle","pilote de bord","pilote continu","pilot dispersé","donnée"])
 
+def phasor(f,N,dtype=complex):
+    """
+    @brief Phaseur exp(2j*pi*f*n), n=0..N-1, par récurrence
+    @details Produit des sqrt(N) premiers termes par les puissances sqrt(N)-ièmes, 2*sqrt(N) exponentielles au lieu de N
+    @param f fréquence réduite
+    @param N nombre d'échantillons
+    @param dtype type numpy complexe du résultat
+    @return le tableau des N échantillons
+    """
+    B=max(1,int(np.ceil(np.sqrt(N))))
+    base=np.exp(2j*np.pi*f*np.arange(B)).astype(dtype)
+    step=np.exp(2j*np.pi*f*B*np.arange(-(-N//B))).astype(dtype)
+    return np.multiply.outer(step,base).reshape(-1)[:N]
+
+def modulate(mat,p):
+    """
+    @brief Modulation OFDM : IFFT des symboles et insertion de l'intervalle de garde
+    @param mat tableau (...,LF,FFT) des sous-porteuses modulées, une ou plusieurs trames
+    @param p instance Param
+    @return le tableau (...,LF*FFT*(1+GI)) des signaux temporels
+    """
+    nGI=int(p.GI*p.FFT)
+    t=_ifft(mat)
+    t*=np.sqrt(p.FFT)
+    return np.concatenate((t[...,p.FFT-nGI:],t),axis=-1).reshape(mat.shape[:-2]+(-1,))
+
+def signal_batch(g,N=1,memMax=2**28,rng=None):
+    """
+    @brief Génération de N trames T2 indépendantes, par paquets de trames
+    @details Les symboles et pilotes sont tirés trame après trame, les trames ne dépendent donc pas de memMax, et un paquet de n trames est modulé par une seule IFFT sur le tableau (n,LF,FFT), n est le plus grand nombre de trames qui tient dans memMax octets
+    @param g instance Grid
+    @param N nombre de trames, 1 par défaut
+    @param memMax mémoire max. d'un paquet en octets, 256 Mo par défaut
+    @param rng générateur pseudo-aléatoire ou graine (cf. rng_of), g.p.rng par défaut
+    @return générateur de couples (mat,t), mat tableau (n,LF,FFT) des sous-porteuses modulées, t tableau (n,LF*FFT*(1+GI)) des signaux temporels
+    """
+    rng=g.p.rng if rng is None else rng_of(rng)
+    symb=(g.p.Aall*g.p.boostD*fmod(g.p.MOD)).astype(g.p.dtype)
+    bpsk=(g.p.Aall*g.p.boostP*fmod("BPSK")).astype(g.p.dtype)
+    # mat, t et le temporaire de l'IFFT
+    size=np.dtype(g.p.dtype).itemsize*g.p.LF*(3*g.p.FFT+int(g.p.GI*g.p.FFT))
+    nb=max(1,int(memMax//size))
+    for i in range(0,N,nb):
+        n=min(nb,N-i)
+        mat=np.zeros((n,g.p.LF*g.p.FFT),dtype=g.p.dtype)
+        for j in range(n):
+            mat[j,g.idxD]=symb[rng.integers(0,len(symb),size=g.nbD)]
+            mat[j,g.idxSP]=g.p.Asp*bpsk[rng.integers(0,2,size=g.nbSP)]
+            mat[j,g.idxCP]=g.p.Acp*bpsk[rng.integers(0,2,size=g.nbCP)]
+            mat[j,g.idxEP]=g.p.Aep*bpsk[rng.integers(0,2,size=g.nbEP)]
+        mat=mat.reshape(n,g.p.LF,g.p.FFT)
+        yield mat,modulate(mat,g.p)
+
+def stream(g,block=1,nbSymb=None,rng=None):
+    """
+    @brief Émetteur en flux : génération des symboles OFDM par blocs, trame T2 après trame T2
+    @details L'indice du symbole dans la trame est conservé d'un bloc au suivant et d'une trame à la suivante, un bloc peut chevaucher deux trames. Les positions des pilotes et des datas d'un bloc sont lues dans les indices de la grille par recherche dichotomique, la mémoire est celle d'un bloc quel que soit le nombre de trames
+    @param g instance Grid
+    @param block nombre de symboles OFDM par bloc, 1 par défaut
+    @param nbSymb nombre total de symboles, None (défaut) pour un flux sans fin
+    @param rng générateur pseudo-aléatoire ou graine (cf. rng_of), g.p.rng par défaut
+    @return générateur de couples (mat,t), mat tableau (n,FFT) des sous-porteuses modulées du bloc, t tableau (n*FFT*(1+GI),) du signal temporel avec intervalles de garde
+    """
+    rng=g.p.rng if rng is None else rng_of(rng)
+    symb=(g.p.Aall*g.p.boostD*fmod(g.p.MOD)).astype(g.p.dtype)
+    bpsk=(g.p.Aall*g.p.boostP*fmod("BPSK")).astype(g.p.dtype)
+    cls=((g.idxD,symb),(g.idxSP,g.p.Asp*bpsk),(g.idxCP,g.p.Acp*bpsk),(g.idxEP,g.p.Aep*bpsk))
+    LF,FFT=g.p.LF,g.p.FFT
+    l=0
+    while nbSymb is None or l<nbSymb:
+        n=block if nbSymb is None else min(block,nbSymb-l)
+        mat=np.zeros((n,FFT),dtype=g.p.dtype)
+        m=mat.reshape(-1)
+        # lignes de la grille du bloc, découpées à la frontière de trame
+        i=0
+        while i<n:
+            r=(l+i)%LF
+            k=min(n-i,LF-r)
+            for idx,tab in cls:
+                a,b=np.searchsorted(idx,(r*FFT,(r+k)*FFT))
+                m[idx[a:b]-(r-i)*FFT]=tab[rng.integers(0,len(tab),size=b-a)]
+            i=i+k
+        l=l+n
+        yield mat,modulate(mat,g.p)
+
 class Signal():
     """@brief Le signal DVBT2 en fréquence (symbole de modulation sur la grille) et en temps (ETSI TS 102 755 v1.1.1)"""
 
-    def __init__(self,g):
+    def __init__(self,g,mat=None,t=None,rng=None):
         """
         @brief Génération du signal en fréquence et en temps
         @param g passage d'une instance de la classe Grid
+        @param mat,t une trame déjà générée (par ex. par signal_batch), None par défaut pour un nouveau tirage
+        @param rng générateur pseudo-aléatoire ou graine (cf. rng_of) du tirage et du bruit, g.p.rng par défaut
         @return mat attribut matrice temps-fréquence des sous-porteuses modulées, signal émis
         @return t attribut signal temporel reçu
+        @return g attribut la grille g
+        @return rng attribut le générateur pseudo-aléatoire utilisé
         """
-        if g.p.seed != -1:
-            rd.seed(g.p.seed)
-            np.random.seed(g.p.seed)
-        self.mat=np.zeros((g.p.LF,g.p.FFT),dtype=complex)
-        self.mat[g.mat==4]=g.p.Aall*g.p.boostD*np.random.choice(fmod(g.p.MOD),size=(g.nbD,))
-        self.mat[g.mat==3]=g.p.Aall*g.p.boostP*g.p.Asp*np.random.choice(fmod("BPSK"),size=(g.nbSP,))
-        self.mat[g.mat==2]=g.p.Aall*g.p.boostP*g.p.Acp*np.random.choice(fmod("BPSK"),size=(g.nbCP,))
-        self.mat[g.mat==1]=g.p.Aall*g.p.boostP*g.p.Aep*np.random.choice(fmod("BPSK"),size=(g.nbEP,))
-        self.t=np.fft.ifft(self.mat)*np.sqrt(g.p.FFT)
-        self.t=np.append(self.t[:,g.p.FFT-int(g.p.GI*g.p.FFT):],self.t,axis=1).reshape(-1,)
+        self.rng=g.p.rng if rng is None else rng_of(rng)
+        # seuls le tirage et la modulation comptent dans le profilage, pas les copies d'une trame existante
+        if mat is None:
+            with _stage("Signal"):
+                mat,t=next(signal_batch(g,rng=self.rng))
+                mat,t=mat[0],t[0]
+        elif t is None:
+            with _stage("Signal"):
+                t=modulate(mat,g.p)
+        self.mat=mat
+        self.t=t
         self.p=g.p
+        self.g=g
         
     def test(self):
         pass
@@ -395,6 +794,7 @@ class Signal():
         @brief Affichage en temps-fréquence ou en temps
         @param T type d'affichage : 'F' temps-fréquence (attribut self.mat), 'T' temporel (attribut self.t)
         """
+        import matplotlib.pyplot as plt
         if T=="F":
             if xmax==0:
                 xmax=self.mat.shape[0]
@@ -424,40 +824,158 @@ class Signal():
         @param D le Doppler introduit par la cible, en case Doppler
         @param SER la RCS de la cible en dB, défaut 0
         """
+        self.add_targets(((d,D,SER),))
+
+    @_staged("add_target")
+    def add_targets(self,targets):
+        """
+        @brief Ajout de plusieurs cibles, le signal reçu est la somme des échos
+        @details Retard entier : décalage du signal, sans FFT. Retard fractionnaire : produit par la rampe de phase en fréquence, avec une FFT du signal commune aux Dopplers entiers (décalage circulaire du spectre), une FFT par cible de Doppler fractionnaire, et une IFFT par valeur de ceil(d)
+        Les cibles sont traitées par retard entier puis par valeur de ceil(d), triées par Doppler : un seul phaseur et un seul spectre accumulé sont gardés, la mémoire ne dépend pas du nbre de cibles
+        @param targets liste de triplets (d,D,SER), cf. add_target
+        """
         zM=self.p.FFT*(1+self.p.GI)*self.p.LF
-        z=self.t*np.exp(2*1j*np.pi*D*np.arange(0,len(self.t))/zM)
-        self.t=np.fft.ifft(np.fft.fft(z)*np.exp(-2*1j*np.pi*d*np.arange(0,len(self.t))/zM))*10**(SER/10)
-        self.t[:int(np.ceil(d))]=0
+        N=len(self.t)
+        out=np.zeros(N,dtype=self.p.dtype)
+        # retards entiers triés par Doppler, puis retards fractionnaires par ceil(d) et Doppler
+        targets=sorted(targets,key=lambda x:(0,0,x[1]) if float(x[0]).is_integer() else (1,int(np.ceil(x[0])),x[1]))
+        # seuls le dernier phaseur Doppler et le spectre du groupe ceil(d) en cours sont gardés
+        ph=(None,None)
+        T=None
+        Y=None
+        for i,(d,D,SER) in enumerate(targets):
+            a=10**(SER/10)
+            if ph[0]!=D and (float(d).is_integer() or not (float(D).is_integer() and zM==N)):
+                ph=(None,None) # libère le phaseur précédent avant le calcul du suivant
+                ph=(D,phasor(D/zM,N,self.p.dtype))
+            if float(d).is_integer():
+                d=int(d)
+                if d<N:
+                    out[d:]+=a*self.t[:N-d]*ph[1][:N-d]
+                continue
+            if float(D).is_integer() and zM==N:
+                if T is None:
+                    T=_fft(self.t)
+                z=np.roll(T,int(D))
+            else:
+                z=_fft(self.t*ph[1],overwrite=True)
+            c=int(np.ceil(d))
+            z*=a*phasor(-d/zM,N,self.p.dtype)
+            if Y is None:
+                Y=z
+            else:
+                Y+=z
+            # IFFT du groupe dès sa dernière cible
+            if i+1==len(targets) or int(np.ceil(targets[i+1][0]))!=c:
+                z=_ifft(Y,overwrite=True)
+                z[:c]=0
+                out+=z
+                Y=None
+        self.t=out
         
-    def add_noise(self,SNR=np.Inf):
+    def channel(self,targets):
+        """
+        @brief Fonction de transfert LFxFFT d'une scène de cibles dont les retards sont dans l'intervalle de garde
+        @details Pour d<=GI*FFT, l'écho d'une cible sur la partie utile du symbole l est le symbole émis multiplié par a*exp(-2j*pi*k*d/FFT) et par le phaseur Doppler pris au milieu du symbole (l'ICI due au Doppler dans le symbole est négligée, cibles lentes). Les retards entiers sont sommés par case retard puis passés par une FFT sur les sous-porteuses, les retards fractionnaires par des produits matriciels par blocs de cibles (retard cyclique dans chaque symbole, qui diffère de l'interpolation sur toute la trame de add_targets)
+        @param targets liste de triplets (d,D,SER), cf. add_target
+        @return H tableau (LF,FFT)
+        """
+        zM=self.p.FFT*(1+self.p.GI)*self.p.LF
+        Ns=self.p.FFT+int(self.p.GI*self.p.FFT)
+        d,D,SER=(np.array(i,dtype=float) for i in zip(*targets))
+        # gains complexes par symbole et par cible
+        P=(10**(SER/10)*np.exp(2j*np.pi*D*(int(self.p.GI*self.p.FFT)-d+(self.p.FFT-1)/2)/zM)*np.exp(2j*np.pi*np.outer(np.arange(self.p.LF)*Ns,D/zM))).astype(self.p.dtype)
+        H=np.zeros((self.p.LF,self.p.FFT),dtype=self.p.dtype)
+        i=np.flatnonzero(d==np.round(d))
+        if len(i)>0:
+            o=i[np.argsort(d[i],kind="stable")]
+            ud,start=np.unique(d[o].astype(int),return_index=True)
+            H[:,ud]=np.add.reduceat(P[:,o],start,axis=1)
+            H=_fft(H,overwrite=True)
+        i=np.flatnonzero(d!=np.round(d))
+        # rampes de phase par blocs de cibles, mémoire bornée par rdmBlock quel que soit le nbre de cibles
+        nb=max(1,rdmBlock//(32*self.p.FFT))
+        for k in range(0,len(i),nb):
+            j=i[k:k+nb]
+            H+=P[:,j]@np.exp(-2j*np.pi*np.outer(d[j],np.arange(self.p.FFT))/self.p.FFT).astype(self.p.dtype)
+        return H
+
+    @_staged("add_target")
+    def add_scene(self,targets):
+        """
+        @brief Ajout d'une scène de cibles (fouillis), le signal reçu est la somme des échos
+        @details Les cibles de retard d<=GI*FFT passent par la fonction de transfert channel appliquée à mat et une seule IFFT, les autres par add_targets. À appeler sur le signal émis
+        @param targets liste de triplets (d,D,SER), cf. add_target
+        """
+        nGI=int(self.p.GI*self.p.FFT)
+        near=[i for i in targets if i[0]<=nGI]
+        far=[i for i in targets if i[0]>nGI]
+        t=modulate(self.mat*self.channel(near),self.p) if len(near)>0 else 0
+        if len(far)>0:
+            self.add_targets(far)
+            self.t=self.t+t
+        elif len(near)>0:
+            self.t=t
+        else:
+            self.t=np.zeros_like(self.t)
+
+    @_staged("add_noise")
+    def add_noise(self,SNR=np.Inf,rng=None,noise=None):
         """
         @brief Ajout du bruit
         @param SNR le snr en dB
+        @param rng générateur pseudo-aléatoire ou graine (cf. rng_of), self.rng par défaut
+        @param noise une réalisation de bruit de variance 2 (parties réelle et imaginaire N(0,1)) de la taille de t, tirée avec rng si None (défaut)
         """
-        tmp=np.random.normal(0,1,self.t.shape[0])+1j*np.random.normal(0,1,self.t.shape[0])
+        if noise is None:
+            rng=self.rng if rng is None else rng_of(rng)
+            # parties réelle et imaginaire N(0,1) entrelacées
+            tmp=rng.standard_normal(2*self.t.shape[0],dtype=self.p.rdtype).view(self.p.dtype)
+        else:
+            tmp=noise.astype(self.p.dtype,copy=False)
         self.t=self.t+tmp*np.sqrt(10**(-SNR/10)/2*np.mean(np.abs(self.t)**2))
 
-class Rdm():
-    """@brief Range-Doppler map. Construction de la carte et affichage"""
-    
-    def __init__(self,s,symbMin=0,symbMax=0,carrierMin=0,carrierMax=0,wind="KAI",beta=0,ZP=False,FA='MF',OFDM=True,symbSize=0,carrierSize=0,SNR=-np.Inf):
+def zoom_dft(x,start,num,step=1,sign=-1,axis=-1):
+    """
+    @brief Transformée de Fourier discrète sur une bande de fréquences : X[k]=sum_n x[n]*exp(sign*2j*pi*(start+k*step)*n/N), k=0..num-1
+    @details Produit matriciel (FFT élaguée) si num<=2*log2(N), FFT complète puis découpage si step=1 et start entier, transformée en z chirp (scipy.signal.czt) sinon
+    @param x le tableau
+    @param start,num,step la première fréquence en case, le nombre de fréquences et le pas en case (1/zoom)
+    @param sign -1 pour la transformée directe, +1 pour l'inverse (sans le facteur 1/N)
+    @param axis l'axe de la transformée
+    @return le tableau transformé, de taille num selon axis
+    """
+    N=x.shape[axis]
+    if num<=2*np.log2(N):
+        W=np.exp(sign*2j*np.pi*np.outer(np.arange(N),start+step*np.arange(num))/N).astype(x.dtype)
+        return np.moveaxis(np.moveaxis(x,axis,-1)@W,-1,axis)
+    if step==1 and float(start).is_integer():
+        X=_fft(x,axis=axis) if sign<0 else _ifft(x,axis=axis)*N
+        return np.take(X,(int(start)+np.arange(num))%N,axis=axis)
+    from scipy.signal import czt
+    X=czt(x,m=num,w=np.exp(sign*2j*np.pi*step/N),a=np.exp(-sign*2j*np.pi*start/N),axis=axis)
+    return X.astype(x.dtype,copy=False)
+
+class RdmPlan():
+    """@brief Plan de calcul de RDM : dimensions, découpage, fenêtre et filtre calculés une fois par géométrie, appliqués ensuite à tout signal reçu"""
+
+    def __init__(self,p,symbMin=0,symbMax=0,carrierMin=0,carrierMax=0,wind="KAI",beta=0,ZP=False,FA='MF',OFDM=True,symbSize=0,carrierSize=0,SNR=-np.Inf,roi=None,zoom=1):
         """
-        @brief Construction de la RDM à partir d'une instance Signal et d'une instance Grid
-        @param s instance Signal (le signal émis et reçu)
-        @param symbMin,symbMax,carrierMin,carrierMax zone de calcul, LFxFFT par défaut en OFDM, LFxFFTx(1+GI) sinon
-        @param wind type de fenêtre, KAI pour Kaiser, KAI2 pour 2D, CHE pour Chebyshev, CHE2, KAI par défaut
-        @param beta paramètre beta de la fenêtre KAI, ou at en dB pour la fenêtre CHE, 0 par défaut
-        @param ZP pour la normalisation de l'amplitude des pilotes à 1 si traitement OFDM, False par défaut
-        @param FA pour le filtre adapté ou non, MF pour matched filter, ZF zero forcing, WF pour MMSE, MF par défaut
-        @param OFDM traitement OFDM ou non, True par défaut
-        @param symbSize,carrierSize nbre d'échantillon short et long, défaut LF x {FFT ou (1+GI)xFFT} cas OFDM ou radar à bruit
-        @param SNR Le SNR en dB
-        @return mat la RDM
-        @return p les attributs p (param) de l'instance signal
-        @return symbSize,carrierSize les dimensions temps long et court utilisé
-        @return min la valeur min des symboles de modulation (utile pour les perf. "pratique" du filtre ZF)
+        @brief Construction du plan, cf. Rdm pour les paramètres
+        @param p instance Param mise à jour
+        @return roi,zoom attributs la zone de la RDM calculée (None pour toute la RDM) et le facteur de zoom
+        @return symbSize,carrierSize attributs les dimensions temps long et court
+        @return sl attribut le découpage (symbMin:symbMax,carrierMin:carrierMax) de la zone de calcul
+        @return w attribut la fenêtre
+        @return min attribut la valeur min des symboles de modulation du dernier signal de référence (filtre ZF)
         """
-        self.p=s.p
+        self.p=p
+        self.ZP=ZP
+        self.FA=FA
+        self.OFDM=OFDM
+        self.SNR=SNR
+        self.roi=roi
+        self.zoom=zoom
         self.symbSize=int(symbSize)
         self.carrierSize=int(carrierSize)
         # choix des dimensions short-symb-x et long-carrier-y
@@ -469,54 +987,390 @@ class Rdm():
                 self.symbSize=self.p.LF
             if self.carrierSize==0:
                 self.carrierSize=int(self.p.FFT*(1+self.p.GI))
-         # re-génération du signal tps émis
-        faMat=np.fft.ifft(s.mat)*np.sqrt(self.p.FFT)
-        faMat=np.append(faMat[:,self.p.FFT-int(self.p.GI*self.p.FFT):],faMat,axis=1).reshape(-1,)
-        # mise en matrice du signal reçu et du filtre
-        if OFDM==True:
-            t_a=s.t.reshape(self.p.LF,int(self.p.FFT*(1+self.p.GI)))[:,int(self.p.FFT*self.p.GI):]
-            faMat=faMat.reshape(self.p.LF,int(self.p.FFT*(1+self.p.GI)))[:,int(self.p.FFT*self.p.GI):]
-        else:
-            t_a=s.t[:self.symbSize*self.carrierSize].reshape(self.symbSize,self.carrierSize)
-            faMat=faMat[:self.symbSize*self.carrierSize].reshape(self.symbSize,self.carrierSize)
-        t_a=np.fft.fft(t_a)/np.sqrt(self.carrierSize)
-        faMat=np.fft.fft(faMat)/np.sqrt(self.carrierSize)
-        # traitement ZF des pilotes
-        if OFDM==True and ZP==True:
-            g=Grid(s.p)
-            faMat[g.mat==3]=1/self.p.Asp
-            faMat[g.mat==2]=1/self.p.Acp
-            faMat[g.mat==1]=1/self.p.Aep
         # pavé de corrélation
         if carrierMax==0:
-            carrierMax=t_a.shape[1]
+            carrierMax=self.carrierSize
         if symbMax==0:
-            symbMax=t_a.shape[0]
+            symbMax=self.symbSize
+        self.sl=(slice(symbMin,symbMax),slice(carrierMin,carrierMax))
+        self.scale=np.sqrt((symbMax-symbMin)*(carrierMax-carrierMin))
         # fenêtre
         if wind=="KAI":
             w=np.kaiser(carrierMax-carrierMin+1,beta)[:-1]
         elif wind=="KAI2":
             w=np.array([np.kaiser(symbMax-symbMin+1,beta)[:-1]]).T*np.kaiser(carrierMax-carrierMin+1,beta)[:-1]
         elif wind=="CHE":
-            w=signal.windows.chebwin(carrierMax-carrierMin,at=beta)
+            from scipy.signal import windows
+            w=windows.chebwin(carrierMax-carrierMin,at=beta)
         elif wind=="CHE2":
-            w=np.array([signal.windows.chebwin(symbMax-symbMin,at=beta)]).T*signal.windows.chebwin(carrierMax-carrierMin,at=beta)
+            from scipy.signal import windows
+            w=np.array([windows.chebwin(symbMax-symbMin,at=beta)]).T*windows.chebwin(carrierMax-carrierMin,at=beta)
         else:
             w=1
-        # filtre et FFT2D
+        self.w=np.asarray(w,dtype=self.p.rdtype)
+        # pilotes remplacés par l'inverse de leur amplitude (ZP)
+        if OFDM==True and ZP==True:
+            g=Grid(p)
+            self.zp=((g.idxSP,1/self.p.Asp),(g.idxCP,1/self.p.Acp),(g.idxEP,1/self.p.Aep))
         self.min=0
+        self._ref=None
+        self._h={}
+
+    def rx(self,t,rows=None):
+        """
+        @brief Mise en matrice et FFT du signal reçu
+        @param t le signal temporel reçu
+        @param rows lignes (slice) à calculer, celles de la zone de calcul si None (défaut)
+        @return le tableau de la zone de calcul, limité aux lignes rows
+        """
+        rows=self.sl[0] if rows is None else rows
+        if self.OFDM==True:
+            nGI=int(self.p.FFT*self.p.GI)
+            t_a=t.reshape(self.p.LF,self.p.FFT+nGI)[rows,nGI:]
+        else:
+            t_a=t[:self.symbSize*self.carrierSize].reshape(self.symbSize,self.carrierSize)[rows]
+        t_a=_fft(t_a)
+        t_a/=np.sqrt(self.carrierSize)
+        return t_a[:,self.sl[1]]
+
+    def fa(self,s,rows=slice(None)):
+        """
+        @brief Symboles de référence (avant filtre) des lignes rows de la RDM complète
+        @param s instance Signal
+        @param rows lignes (slice), toutes par défaut
+        @return le tableau (lignes rows x carrierSize)
+        """
+        r0,r1,_=rows.indices(self.symbSize)
+        if self.OFDM==True:
+            # la modulation puis la FFT de la partie utile redonnent la trame émise
+            faMat=np.array(s.mat[r0:r1],dtype=self.p.dtype)
+            if self.ZP==True:
+                m=faMat.reshape(-1)
+                for idx,a in self.zp:
+                    i,j=np.searchsorted(idx,(r0*self.p.FFT,r1*self.p.FFT))
+                    m[idx[i:j]-r0*self.p.FFT]=a
+        else:
+            # re-génération du signal tps émis, limitée aux symboles OFDM des lignes
+            Ns=self.p.FFT+int(self.p.GI*self.p.FFT)
+            a,b=r0*self.carrierSize,r1*self.carrierSize
+            l0,l1=a//Ns,-(-b//Ns)
+            faMat=modulate(s.mat[l0:l1],self.p)[a-l0*Ns:b-l0*Ns].reshape(r1-r0,self.carrierSize)
+            faMat=_fft(faMat,overwrite=True)
+            faMat/=np.sqrt(self.carrierSize)
+        return faMat
+
+    def filt(self,faMat,SNR,mean=None):
+        """
+        @brief Filtre MF, ZF ou WF des symboles de référence
+        @param faMat les symboles de référence, écrasé
+        @param SNR le SNR en dB du filtre WF
+        @param mean la moyenne de |faMat|**2 sur toute la RDM (filtre WF), celle de faMat si None (défaut)
+        @return le filtre
+        """
+        if self.FA=='MF':
+            faMat=np.conjugate(faMat,out=faMat)
+        elif self.FA=='ZF':
+            small=abs(faMat)<=np.sqrt(epsZF)
+            faMat[small]=1
+            faMat=np.divide(1,faMat,out=faMat)
+            faMat[small]=0
+        elif self.FA=='WF':
+            a2=np.abs(faMat)**2
+            mean=np.mean(a2) if mean is None else mean
+            faMat=np.conjugate(faMat)/(a2+10**(-SNR/10)*mean)
+        return faMat
+
+    def ref(self,s,SNR=None):
+        """
+        @brief Filtre fenêtré de la zone de calcul, mis en cache pour la trame émise s.mat (et le SNR du filtre WF)
+        @param s instance Signal
+        @param SNR le SNR en dB du filtre WF, celui du plan si None (défaut)
+        @return le tableau du filtre fenêtré
+        """
+        SNR=self.SNR if SNR is None else SNR
+        if self._ref is not s.mat:
+            self._ref=s.mat
+            self._h={}
+        key=SNR if self.FA=='WF' else None
+        if key in self._h:
+            return self._h[key]
+        faMat=self.fa(s)
+        self.min=np.min(abs(faMat)) if self.FA=='ZF' else 0
+        self._h[key]=self.w*self.filt(faMat,SNR)[self.sl]
+        return self._h[key]
+
+    def transform(self,P):
+        """
+        @brief FFT2D inverse et retournement de l'axe Doppler, la RDM à partir du produit signal reçu x filtre
+        @details ifft retournée sur l'axe Doppler = fft/symbSize, le retournement est fait par la transformée directe
+        @param P le produit, tableau (...,x,y), écrasé
+        @return la RDM, ou la zone roi de la RDM au pas 1/zoom
+        """
+        n=P.shape[-2]
+        if self.roi is not None:
+            # transformées élaguées ou zoomées, axe de plus petite sortie d'abord, 1/N de l'IFFT sur les retards
+            n1=P.shape[-1]
+            xmin,xmax,ymin,ymax=self.roi
+            ax=((-1,ymin,int(round((ymax-ymin)*self.zoom)),1),(-2,xmin,int(round((xmax-xmin)*self.zoom)),-1))
+            if ax[1][2]<ax[0][2]:
+                ax=ax[::-1]
+            for axis,start,num,sign in ax:
+                P=zoom_dft(P,start,num,1/self.zoom,sign,axis)
+            P*=self.scale/(n*n1)
+            return P
+        P=_ifft(_fft(P,axis=-2,overwrite=True),axis=-1,overwrite=True)
+        P*=self.scale/n
+        return P
+
+    @_staged("Rdm")
+    def apply(self,s,SNR=None):
+        """
+        @brief Calcul de la RDM d'un signal
+        @param s instance Signal (le signal émis et reçu)
+        @param SNR le SNR en dB du filtre WF, celui du plan si None (défaut)
+        @return la RDM
+        """
+        return self.transform(self.rx(s.t)*self.ref(s,SNR))
+
+    @_staged("Rdm")
+    def apply_ooc(self,s,SNR=None,memMax=2**28,fichMap=""):
+        """
+        @brief Calcul hors mémoire de la RDM d'un signal, pour les grandes géométries
+        @details FFT 1D par blocs de lignes (retards) puis par blocs de colonnes (Doppler) dans un fichier projeté en mémoire, la mémoire utilisée est bornée par memMax et non par la taille de la RDM. Sans roi.
+        @param s instance Signal (le signal émis et reçu)
+        @param SNR le SNR en dB du filtre WF, celui du plan si None (défaut)
+        @param memMax mémoire de travail en octets, 256 Mo par défaut
+        @param fichMap fichier de la RDM, fichier temporaire si "" (défaut)
+        @return la RDM, np.memmap
+        """
+        SNR=self.SNR if SNR is None else SNR
+        r0,r1,_=self.sl[0].indices(self.symbSize)
+        n0,n1=r1-r0,len(range(*self.sl[1].indices(self.carrierSize)))
+        isz=np.dtype(self.p.dtype).itemsize
+        nb=max(1,int(memMax//(6*self.carrierSize*isz)))
+        # min (ZF) et moyenne (WF) des symboles de référence sur toute la RDM
+        self.min,mean=0,None
+        if self.FA in ('ZF','WF'):
+            acc,mn=0,np.Inf
+            for i in range(0,self.symbSize,nb):
+                a=np.abs(self.fa(s,slice(i,i+nb)))
+                acc+=np.sum(a**2)
+                mn=min(mn,a.min())
+            mean=acc/(self.symbSize*self.carrierSize)
+            self.min=mn if self.FA=='ZF' else 0
+        M=np.memmap(fichMap if fichMap else tempfile.TemporaryFile(),dtype=self.p.dtype,mode="w+",shape=(n0,n1))
+        # passe 1 : blocs de lignes, produit par le filtre fenêtré et IFFT sur les retards
+        for i in range(r0,r1,nb):
+            j=min(i+nb,r1)
+            P=self.rx(s.t,slice(i,j))
+            P*=self.w[i-r0:j-r0] if self.w.ndim==2 else self.w
+            P*=self.filt(self.fa(s,slice(i,j)),SNR,mean)[:,self.sl[1]]
+            M[i-r0:j-r0]=_ifft(P,overwrite=True)
+        # passe 2 : blocs de colonnes, FFT sur le Doppler (ifft retournée)
+        nc=max(1,int(memMax//(3*n0*isz)))
+        for i in range(0,n1,nc):
+            P=_fft(M[:,i:i+nc],axis=0)
+            P*=self.scale/n0
+            M[:,i:i+nc]=P
+        M.flush()
+        return M
+
+@_staged("pislr")
+def pislr_maps(M,x0=None,y0=None,dx=0,dy=0,wrap=True,dB=False,memMax=rdmBlock):
+    """
+    @brief PSLR et ISLR d'une RDM ou d'une pile de RDM, pour une ou plusieurs cibles par RDM
+    @details Une passe par blocs de lignes donne le max., sa position et la somme de |M|**2 par ligne, seules les lignes des lobes principaux sont ensuite relues et masquées par tranches. M peut être un np.memmap.
+    @param M la RDM ou la pile de RDM, tableau (...,n0,n1)
+    @param x0,y0 indices des cibles dans les RDM, scalaires ou tableaux (K,) ou (...,K), None (défaut) pour le max. de chaque RDM
+    @param dx,dy zone du lobe principal x0+-dx,y0+-dy, en indices
+    @param wrap repliement du lobe principal aux bords (RDM complète), True par défaut, sinon le lobe est tronqué
+    @param dB à True si résultats en dB
+    @param memMax mémoire en octets d'un bloc de lignes
+    @return pslr,islr,pslrm,islrm tableaux (...,K), les deux derniers sans prendre en compte la réponse temps court en x0
+    """
+    n0,n1=M.shape[-2:]
+    st=M.shape[:-2]
+    M2=M.reshape(-1,n1)
+    B=M2.shape[0]//n0
+    # max., position du max. et somme de |M|**2 par ligne
+    nb=max(1,int(memMax//(2*n1*M.itemsize)))
+    rowMax,rowSum,rowArg=np.empty(B*n0),np.empty(B*n0),np.empty(B*n0,dtype=np.intp)
+    for i in range(0,B*n0,nb):
+        t_a=M2[i:i+nb]
+        t_a=t_a.real**2+t_a.imag**2
+        rowArg[i:i+nb]=np.argmax(t_a,axis=1)
+        rowMax[i:i+nb]=np.take_along_axis(t_a,rowArg[i:i+nb,None],axis=1)[:,0]
+        rowSum[i:i+nb]=t_a.sum(axis=1)
+    rowMax,rowSum,rowArg=rowMax.reshape(B,n0),rowSum.reshape(B,n0),rowArg.reshape(B,n0)
+    xM=np.argmax(rowMax,axis=1)
+    yM=rowArg[np.arange(B),xM]
+    # cibles (B,K)
+    x0,y0=(np.reshape(vM,st+(1,)) if v is None else np.asarray(v,dtype=np.intp).reshape((1,) if np.ndim(v)==0 else np.shape(v)) for v,vM in ((x0,xM),(y0,yM)))
+    x0,y0,_=np.broadcast_arrays(x0,y0,np.empty(st+(1,),dtype=bool))
+    x0,y0=x0.reshape(B,-1),y0.reshape(B,-1)
+    # lobes principaux, indices fictifs n0 et n1 hors RDM
+    if wrap==True:
+        dx,dy=min(dx,(n0-1)//2),min(dy,(n1-1)//2)
+    ix=x0[...,None]+np.arange(-dx,dx+1)
+    iy=y0[...,None]+np.arange(-dy,dy+1)
+    if wrap==True:
+        x0,y0,ix,iy=x0%n0,y0%n1,ix%n0,iy%n1
+    else:
+        ix,iy=np.where((ix>=0)&(ix<n0),ix,n0),np.where((iy>=0)&(iy<n1),iy,n1)
+    b=np.arange(B)[:,None]
+    z0=np.abs(M2[b*n0+x0,y0])**2
+    R=np.abs(M2[b[...,None]*n0+np.minimum(ix,n0-1)])**2
+    R[ix==n0]=0
+    col=np.zeros(x0.shape+(n1+1,),dtype=bool)
+    np.put_along_axis(col,iy,True,axis=-1)
+    col=col[...,None,:n1]
+    out=np.ones(x0.shape+(n0+1,),dtype=bool)
+    np.put_along_axis(out,ix,False,axis=-1)
+    out=out[...,:n0]
+    rowMax,rowSum=np.broadcast_to(rowMax[:,None],out.shape),np.broadcast_to(rowSum[:,None],out.shape)
+    # PSLR et ISLR classique, énergie lobe principal et suppression
+    z0s=np.sum(R,axis=-2,where=col)
+    z0s=np.sum(z0s,axis=-1)
+    R[np.broadcast_to(col,R.shape)]=0
+    zM=np.maximum(np.max(rowMax,axis=-1,where=out,initial=0),R.max(axis=(-2,-1)))
+    zS=np.sum(rowSum,axis=-1,where=out)
+    pslr=z0/zM
+    islr=z0s/(zS+R.sum(axis=(-2,-1)))
+    # PSLR et ISLR sans la réponse en x0 (ligne centrale du lobe)
+    R[...,dx,:]=0
+    pslrm=z0/np.maximum(np.max(rowMax,axis=-1,where=out,initial=0),R.max(axis=(-2,-1)))
+    islrm=z0s/(zS+R.sum(axis=(-2,-1)))
+    res=tuple(v.reshape(st+(-1,)) for v in (pslr,islr,pslrm,islrm))
+    if dB==True:
+        res=tuple(10*np.log10(v) for v in res)
+    return res
+
+@_staged("pislrTheo")
+def pislr_theo(SNR=np.Inf,D=0,d=0,symbSize=1,carrierSize=1,GI=0,FFT=1,MOD="QPSK",FA="MF",OFDM=True,bmin=0,dB=False):
+    """
+    @brief Calcul des perf. théorique, OFDM random sans interférence, sur des tableaux de paramètres
+    @details Les paramètres numériques (et MOD) sont diffusés entre eux (broadcast numpy), une surface SNR x D x d x config est obtenue en un appel sans simulation
+    @param SNR Le SNR en dB, défaut infini
+    @param D Le Doppler en nombre d'échantillon, défaut 0
+    @param d Le retard en nombre d'échantillon, défaut 0
+    @param symbSize,carrierSize les dimensions temps long et court de la RDM (LF et FFT en OFDM)
+    @param GI,FFT l'intervalle de garde et la taille FFT
+    @param MOD la modulation, ou tableau de modulations
+    @param FA Le filtre MF, ZF ou WF, défaut MF
+    @param OFDM à True pour les perf. OFDM
+    @param bmin la valeur min des coeff du filtre (ZF random), 0 par défaut
+    @param dB à True si résultats en dB, défaut False
+    @return pslr,islr tableaux de la forme diffusée des paramètres (scalaires si tous les paramètres le sont)
+    """
+    from scipy import special
+    SNR,D,d,symbSize,carrierSize,GI,FFT,bmin=np.broadcast_arrays(*(np.asarray(v,dtype=float) for v in (SNR,D,d,symbSize,carrierSize,GI,FFT,bmin)))
+    MOD=np.asarray(MOD)
+    sacmac=np.ones(np.broadcast_shapes(SNR.shape,MOD.shape))
+    scsamac=np.ones(sacmac.shape)
+    D=D/symbSize
+    s2=10**(-SNR/10)
+    if OFDM==True:
+        D=D/(1+GI)
+        d=(d-GI*FFT+np.abs(d-GI*FFT))/2
+        # moyennes sur la constellation (axe ajouté en dernier) pour les seules valeurs distinctes du SNR
+        u,inv=np.unique(s2,return_inverse=True)
+        s=u[:,None]
+        for mod in np.unique(MOD):
+            a=np.abs(fmod(str(mod)))
+            m=MOD==mod
+            if FA=='MF':
+                x,y=np.mean(a**4),1
+            elif FA=='ZF':
+                x,y=1,np.mean(1/a**2)
+            elif FA=='WF':
+                x=(np.mean(a**4/(a**2+s)**2,axis=-1)/np.mean(a**2/(a**2+s),axis=-1)**2)[inv].reshape(s2.shape)
+                y=(np.mean(a**2/(a**2+s)**2,axis=-1)/np.mean(a**2/(a**2+s),axis=-1)**2)[inv].reshape(s2.shape)
+            else:
+                continue
+            sacmac=np.where(m,x,sacmac)
+            scsamac=np.where(m,y,scsamac)
+    else:
         if FA=='MF':
-            faMat=np.conjugate(faMat)
+            sacmac=sacmac*2
         elif FA=='ZF':
-            self.min=np.min(abs(faMat))
-            tmp=np.copy(faMat)
-            faMat[abs(faMat)<=np.sqrt(epsZF)]=1
-            faMat=1/faMat
-            faMat[abs(tmp)<=np.sqrt(epsZF)]=0
+            b2=np.where(bmin==0,epsZF,bmin**2)
+            sacmac=np.where(bmin==0,1,1/np.exp(-b2))*sacmac
+            scsamac=-special.expi(-b2)/np.exp(-2*b2)*scsamac
         elif FA=='WF':
-            faMat=np.conjugate(faMat)/(np.abs(faMat)**2+10**(-SNR/10)*np.mean(np.abs(faMat)**2))
-        self.mat=np.fft.ifft2(w*t_a[symbMin:symbMax,carrierMin:carrierMax]*faMat[symbMin:symbMax,carrierMin:carrierMax])*np.sqrt((symbMax-symbMin)*(carrierMax-carrierMin))
-        self.mat=np.concatenate((self.mat[:1,:],self.mat[-1:0:-1,:]),axis=0)
+            # exp(s2)*E1(s2) calculé une fois par valeur distincte du SNR
+            u,inv=np.unique(s2,return_inverse=True)
+            e=(np.exp(u)*special.expi(-u))[inv].reshape(s2.shape)
+            sacmac=(1+s2+s2*e*(2+s2))/(1+s2*e)**2*sacmac
+            scsamac=(-1-(1+s2)*e)/(1+s2*e)**2*scsamac
+    tmp=1+symbSize*(carrierSize-d)/(sacmac-1+scsamac*(1-np.sinc(D)**2+s2/(1-d/carrierSize)+d/(carrierSize-d))/np.sinc(D)**2) # OK OFDM avec et sans interf.
+    Hn=np.log(symbSize*carrierSize-1)+0.5772156649+1/2/(symbSize*carrierSize-1) # approx. Euler-Mascheroni
+    pslr=tmp/Hn
+    islr=tmp/(symbSize*carrierSize-1)
+    if dB==True:
+        pslr,islr=10*np.log10(pslr),10*np.log10(islr)
+    return pslr[()],islr[()]
+
+class Rdm():
+    """@brief Range-Doppler map. Construction de la carte et affichage"""
+    
+    def __init__(self,s,symbMin=0,symbMax=0,carrierMin=0,carrierMax=0,wind="KAI",beta=0,ZP=False,FA='MF',OFDM=True,symbSize=0,carrierSize=0,SNR=-np.Inf,roi=None,zoom=1,plan=None,memMax=0,fichMap=""):
+        """
+        @brief Construction de la RDM à partir d'une instance Signal et d'une instance Grid
+        @param s instance Signal (le signal émis et reçu)
+        @param symbMin,symbMax,carrierMin,carrierMax zone de calcul, LFxFFT par défaut en OFDM, LFxFFTx(1+GI) sinon
+        @param wind type de fenêtre, KAI pour Kaiser, KAI2 pour 2D, CHE pour Chebyshev, CHE2, KAI par défaut
+        @param beta paramètre beta de la fenêtre KAI, ou at en dB pour la fenêtre CHE, 0 par défaut
+        @param ZP pour la normalisation de l'amplitude des pilotes à 1 si traitement OFDM, False par défaut
+        @param FA pour le filtre adapté ou non, MF pour matched filter, ZF zero forcing, WF pour MMSE, MF par défaut
+        @param OFDM traitement OFDM ou non, True par défaut
+        @param symbSize,carrierSize nbre d'échantillon short et long, défaut LF x {FFT ou (1+GI)xFFT} cas OFDM ou radar à bruit
+        @param SNR Le SNR en dB
+        @param roi zone (xmin,xmax,ymin,ymax) de la RDM à calculer, en cases Doppler et retard, None (défaut) pour toute la RDM
+        @param zoom facteur de zoom de la zone roi (pas de 1/zoom case), 1 par défaut
+        @param plan instance RdmPlan déjà construite (les paramètres précédents sont alors ignorés, sauf SNR s'il est fini qui remplace celui du plan pour le filtre WF), None par défaut
+        @param memMax mémoire de travail en octets du calcul hors mémoire (cf. RdmPlan.apply_ooc, sans roi), 0 (défaut) pour un calcul en mémoire
+        @param fichMap fichier de la RDM hors mémoire, fichier temporaire si "" (défaut)
+        @return mat la RDM (np.memmap hors mémoire)
+        @return p les attributs p (param) de l'instance signal
+        @return symbSize,carrierSize les dimensions temps long et court utilisé
+        @return min la valeur min des symboles de modulation (utile pour les perf. "pratique" du filtre ZF)
+        @return plan le plan de calcul
+        @return xo,yo,zoom origine de la zone roi (0,0 pour toute la RDM) et facteur de zoom, l'indice i de mat correspond à la case xo+i/zoom
+        @return memMax mémoire en octets d'un bloc de lignes pour le calcul des métriques
+        """
+        if plan is None:
+            plan=RdmPlan(s.p,symbMin,symbMax,carrierMin,carrierMax,wind,beta,ZP,FA,OFDM,symbSize,carrierSize,SNR,roi,zoom)
+        if SNR==-np.Inf:
+            SNR=None
+        if memMax>0 and plan.roi is None:
+            self.init(plan,plan.apply_ooc(s,SNR,memMax,fichMap))
+            self.memMax=memMax
+        else:
+            self.init(plan,plan.apply(s,SNR))
+
+    def init(self,plan,mat):
+        """@brief Affectation des attributs à partir du plan et de la RDM"""
+        self.p=plan.p
+        self.plan=plan
+        self.symbSize=plan.symbSize
+        self.carrierSize=plan.carrierSize
+        self.mat=mat
+        self.min=plan.min
+        self.xo,self.yo=(0,0) if plan.roi is None else (plan.roi[0],plan.roi[2])
+        self.zoom=1 if plan.roi is None else plan.zoom
+        self.memMax=rdmBlock
+
+    @staticmethod
+    def from_plan(plan,mat):
+        """
+        @brief Instance Rdm à partir d'une RDM déjà calculée par le plan plan (cf. rdm_batch)
+        @param plan instance RdmPlan
+        @param mat la RDM
+        @return l'instance Rdm
+        """
+        r=Rdm.__new__(Rdm)
+        r.init(plan,mat)
+        return r
         
     def test(D=0,d=0,SNR=3,FA='MF',GI=0,OFDM=True):
         # exécuter Rmd.test() mais pas très orthodoxe !
@@ -547,6 +1401,8 @@ class Rdm():
         @param shift fftshift sur le temps long, False par défaut
         @param view 1Dx, 1Dy, 2D ou 3D, 2D par défaut, 1Dx coupe x en ymin
         """
+        import matplotlib.pyplot as plt
+        from matplotlib import cm
         if xmax==0:
             xmax=self.mat.shape[0]
         else:
@@ -568,6 +1424,9 @@ class Rdm():
         else:
             dBmin=np.min(t_a)
             zTxt=""
+        # indices de mat -> cases retard-Doppler (RDM partielle)
+        xmin,xmax=tuple(self.xo+i/self.zoom for i in (xmin,xmax))
+        ymin,ymax=tuple(self.yo+i/self.zoom for i in (ymin,ymax))
         fig=plt.figure(dpi=300)
         if unit=="I":
             xTxt,yTxt="Doppler","retard"
@@ -606,46 +1465,69 @@ class Rdm():
     def pislr(self,x0=np.Inf,y0=np.Inf,dx=0,dy=0,dB=False):
         """
         @brief Calcul le PSLR et l'ISLR pour une cible connue (x0,y0) ou pour le 1er max.
-        @param x0,y0 coordonnées de la cible, en indice et si connues, mettre à np.Inf si inconnues (défaut)
-        @param dx,dy zone en indice du lobe principal, x0+-dx,y0+-dy, x temps long, y temps court
+        @param x0,y0 coordonnées de la cible, en case et si connues, mettre à np.Inf si inconnues (défaut), ou tableaux (K,) pour plusieurs cibles
+        @param dx,dy zone en case du lobe principal, x0+-dx,y0+-dy, x temps long, y temps court
         @param dB à True si résultats en dB
         @return prls,islr normaux
         @return pslrm,islrm sans prendre en compte la réponse temps court en x0
+        @details Pour une RDM partielle (roi), les grandeurs sont calculées sur la zone, au pas 1/zoom, sans repliement aux bords, cf. pislr_maps
         """
-        x0=x0%self.symbSize
-        y0=y0%self.carrierSize
-        t_a=np.abs(self.mat)**2
-        a=np.where(t_a==t_a.max())
-        if len(a[0])==2:
-            a=a[0]
-        if x0==np.Inf:
-            x0=int(a[0])
-        if y0==np.Inf:
-            y0=int(a[1])
-        # PSLR et ISLR classique
-        # taille lobe principal
-        z0=t_a[x0,y0]
-        # énergie lobe principal et suppression
-        z0s=0
-        for i in np.arange(-dx,dx+1):
-            for j in np.arange(-dy,dy+1):
-                z0s=z0s+t_a[(x0+i)%self.symbSize,(y0+j)%self.carrierSize]
-                t_a[(x0+i)%self.symbSize,(y0+j)%self.carrierSize]=0
-        # calcul PSLR et ISLR
-        zM=t_a.max()
-        zS=np.sum(t_a)
-        pslr=z0/zM
-        islr=z0s/zS
-        # PSLR et ISLR sans la réponse en x0 
-        t_a[x0,:]=0
-        zM=t_a.max()
-        zS=np.sum(t_a)
-        pslrm=z0/zM
-        islrm=z0s/zS
-        if dB==True:
-            pslr,islr,pslrm,islrm=10*np.log10((pslr,islr,pslrm,islrm))
-        return pslr,islr,pslrm,islrm
+        one=np.ndim(x0)==0 and np.ndim(y0)==0
+        # indices dans mat
+        x0,y0=(None if np.ndim(v)==0 and v==np.Inf else np.round((np.asarray(v)-o)*self.zoom).astype(int) for v,o in ((x0,self.xo),(y0,self.yo)))
+        res=pislr_maps(self.mat,x0,y0,int(round(dx*self.zoom)),int(round(dy*self.zoom)),self.plan.roi is None,dB,self.memMax)
+        if one==True:
+            return tuple(v[0] for v in res)
+        return res
     
+    @_staged("cfar")
+    def cfar(self,guard=(2,2),train=(4,4),pfa=1e-6,mode="CA",k=0.75,peak=True):
+        """
+        @brief Détection CFAR 2D, CA ou OS, sur la RDM
+        @details La fenêtre de (2(guard+train)+1) cases par axe est privée des (2guard+1) cases de garde autour de la case testée. CA : moyenne des cases d'apprentissage par sommes cumulées (coût linéaire en nombre de cases), OS : k-ième valeur (scipy.ndimage.rank_filter). Bords repliés pour la RDM complète (axes périodiques), réfléchis pour une RDM partielle (roi)
+        @param guard,train nombres de cases de garde et d'apprentissage de part et d'autre, (Doppler,retard) ou entier
+        @param pfa probabilité de fausse alarme sur bruit exponentiel, fixe le seuil, 1e-6 par défaut
+        @param mode "CA" (défaut) ou "OS"
+        @param k rang OS en fraction du nombre de cases d'apprentissage, 0.75 par défaut
+        @param peak ne garder que les max. locaux (3x3), True par défaut
+        @return tableau structuré des détections (D,d,P,N) : Doppler (signé, les cases au-delà de la moitié de l'axe Doppler de la RDM complète sont négatives, comme pour add_target et la roi) et retard en case, puissance et bruit local, par puissance décroissante
+        """
+        from scipy import ndimage, optimize
+        P=self.mat.real**2+self.mat.imag**2
+        P=P.astype(float,copy=False)
+        g=np.broadcast_to(np.asarray(guard,dtype=int),2)
+        h=g+np.broadcast_to(np.asarray(train,dtype=int),2)
+        nT=int(np.prod(2*h+1)-np.prod(2*g+1))
+        wrap=self.plan.roi is None
+        if mode=="CA":
+            def box(X,h):
+                # somme glissante sur (2h+1) cases de chaque axe, par sommes cumulées
+                for axis in (0,1):
+                    X=np.cumsum(np.pad(X,[(h[a]+1,h[a]) if a==axis else (0,0) for a in (0,1)],mode="wrap" if wrap else "symmetric"),axis=axis)
+                    n=2*h[axis]+1
+                    X=X[n:]-X[:-n] if axis==0 else X[:,n:]-X[:,:-n]
+                return X
+            N=(box(P,h)-box(P,g))/nT
+            alpha=nT*(pfa**(-1/nT)-1)
+        else:
+            fp=np.ones(2*h+1,dtype=bool)
+            fp[h[0]-g[0]:h[0]+g[0]+1,h[1]-g[1]:h[1]+g[1]+1]=False
+            r=min(max(int(k*nT),1),nT)
+            N=ndimage.rank_filter(P,r-1,footprint=fp,mode="wrap" if wrap else "reflect")
+            i=np.arange(r)
+            alpha=optimize.brentq(lambda a:np.sum(np.log((nT-i)/(nT-i+a)))-np.log(pfa),1e-12,1e12)
+        det=P>alpha*N
+        if peak==True:
+            det&=P>=ndimage.maximum_filter(P,size=3,mode="wrap" if wrap else "reflect")
+        i,j=np.nonzero(det)
+        o=np.argsort(-P[i,j],kind="stable")
+        i,j=i[o],j[o]
+        out=np.empty(len(i),dtype=[("D",float),("d",float),("P",float),("N",float)])
+        # Doppler signé sur la RDM complète
+        x=np.where(i>P.shape[0]//2,i-P.shape[0],i) if wrap else i
+        out["D"],out["d"],out["P"],out["N"]=self.xo+x/self.zoom,self.yo+j/self.zoom,P[i,j],N[i,j]
+        return out
+
     def pislrTheo(self,SNR=np.Inf,FA="MF",D=0,d=0,dB=False,OFDM=True,bmin=0):
         """
         @brief Calcul des perf. théorique, OFDM random sans interférence
@@ -657,41 +1539,119 @@ class Rdm():
         @param OFDM à True pour les perf. OFDM
         @param bmin pour paser la valeur min des coeff du filtre
         @return pslr,islr
+        @details cf. pislr_theo pour des tableaux de paramètres
         """
-        sacmac=1
-        scsamac=1
-        a=np.abs(fmod(self.p.MOD))
-        D=D/self.symbSize
-        s2=10**(-SNR/10)
-        if OFDM==True:
-            D=D/(1+self.p.GI)
-            d=(d-self.p.GI*self.p.FFT+np.abs(d-self.p.GI*self.p.FFT))/2
-            if FA=='MF':
-                sacmac=np.mean(a**4)
-            elif FA=='ZF':
-                scsamac=np.mean(1/a**2)
-            elif FA=='WF':
-                sacmac=np.mean(a**4/(a**2+s2)**2)/np.mean(a**2/(a**2+s2))**2
-                scsamac=np.mean(a**2/(a**2+s2)**2)/np.mean(a**2/(a**2+s2))**2
-        else:
-            if FA=='MF':
-                sacmac=2
-            elif FA=='ZF':
-                if bmin==0:
-                    scsamac=-special.expi(-epsZF)/np.exp(-2*epsZF)
-                else:   
-                    sacmac=1/np.exp(-bmin**2)
-                    scsamac=-special.expi(-bmin**2)/np.exp(-2*bmin**2)
-            elif FA=='WF':
-                sacmac=(1+s2+s2*np.exp(s2)*special.expi(-s2)*(2+s2))/(1+s2*np.exp(s2)*special.expi(-s2))**2
-                scsamac=(-1-(1+s2)*np.exp(s2)*special.expi(-s2))/(1+s2*np.exp(s2)*special.expi(-s2))**2
-        tmp=1+self.symbSize*(self.carrierSize-d)/(sacmac-1+scsamac*(1-np.sinc(D)**2+s2/(1-d/self.carrierSize)+d/(self.carrierSize-d))/np.sinc(D)**2) # OK OFDM avec et sans interf.
-        Hn=np.log(self.symbSize*self.carrierSize-1)+0.5772156649+1/2/(self.symbSize*self.carrierSize-1) # approx. Euler-Mascheroni
-        pslr=tmp/Hn
-        islr=tmp/(self.symbSize*self.carrierSize-1)
-        if dB==True:
-            pslr,islr=10*np.log10((pslr,islr))
-        return pslr,islr
+        return pislr_theo(SNR,D,d,self.symbSize,self.carrierSize,self.p.GI,self.p.FFT,self.p.MOD,FA,OFDM,bmin,dB)
+
+@_staged("Rdm")
+def rdm_batch(s,variants,beta=80,symbSize=0,carrierSize=0,SNR=-np.Inf):
+    """
+    @brief Calcul de plusieurs RDM d'un même signal reçu (variantes de filtre, fenêtre, ZP, OFDM) en une passe
+    @details Les variantes de même géométrie partagent la mise en matrice et la FFT du signal reçu, leurs produits par les filtres sont empilés et passent par une seule FFT2D
+    @param s instance Signal
+    @param variants liste de quadruplets (FA,wind,ZP,OFDM) ou d'instances RdmPlan (à réutiliser d'un appel à l'autre pour garder les filtres en cache)
+    @param beta,symbSize,carrierSize,SNR paramètres communs des variantes, cf. Rdm, SNR remplace celui des plans s'il est fini
+    @return la liste des instances Rdm, dans l'ordre de variants, leurs attributs mat sont des vues sur une pile par géométrie
+    """
+    plans=[v if isinstance(v,RdmPlan) else RdmPlan(s.p,wind=v[1],beta=beta,ZP=v[2],FA=v[0],OFDM=v[3],symbSize=symbSize,carrierSize=carrierSize,SNR=SNR) for v in variants]
+    SNR=None if SNR==-np.Inf else SNR
+    geo={}
+    for i,plan in enumerate(plans):
+        geo.setdefault((plan.OFDM,plan.symbSize,plan.carrierSize,plan.sl[0].indices(plan.symbSize),plan.sl[1].indices(plan.carrierSize),plan.roi,plan.zoom),[]).append(i)
+    out=[None]*len(plans)
+    for li in geo.values():
+        rx=plans[li[0]].rx(s.t)
+        P=np.empty((len(li),)+rx.shape,dtype=rx.dtype)
+        for j,i in enumerate(li):
+            np.multiply(rx,plans[i].ref(s,SNR),out=P[j])
+        M=plans[li[0]].transform(P)
+        for j,i in enumerate(li):
+            out[i]=Rdm.from_plan(plans[i],M[j])
+    return out
+
+def bench_import(n=5,tmax=0):
+    """
+    @brief Temps d'import de dvbt2lib dans un nouvel interpréteur, sans tracé ni calcul
+    @param n nombre de mesures, la médiane est retenue, 5 par défaut
+    @param tmax temps max. en s, AssertionError s'il est dépassé ou si l'import charge matplotlib ou scipy, 0 (défaut) sans contrôle
+    @return le temps médian en s
+    """
+    code="import sys,time;t=time.perf_counter();import dvbt2lib;t=time.perf_counter()-t;print(t,any(m.split('.')[0] in ('matplotlib','scipy') for m in sys.modules))"
+    env=dict(os.environ,PYTHONPATH=os.pathsep.join(filter(None,(os.path.dirname(os.path.abspath(__file__)),os.environ.get("PYTHONPATH","")))))
+    r=[subprocess.run([sys.executable,"-c",code],capture_output=True,text=True,env=env,check=True).stdout.split() for i in range(n)]
+    t=float(np.median([float(i[0]) for i in r]))
+    heavy=any(i[1]=="True" for i in r)
+    print(f"import dvbt2lib : {1e3*t:.1f} ms{' (matplotlib ou scipy chargé)' if heavy==True else ''}")
+    if tmax>0:
+        assert t<=tmax and heavy==False, f"import dvbt2lib trop lent ou trop lourd : {1e3*t:.1f} ms > {1e3*tmax:.1f} ms"
+    return t
+
+def bench(config=None,n=3,fichOut="",fichBase="",tol=0.25):
+    """
+    @brief Banc de mesure des étapes de la chaîne Grid, Signal, add_target, add_noise, Rdm (6 récepteurs), pislr et pislrTheo
+    @details Temps : meilleur de n exécutions, débit en échantillons de la trame par seconde, pic mémoire : exécution supplémentaire sous tracemalloc. Grille construite sans le cache disque
+    @param config les configurations, la première de chaque taille FFT de 1K à 32K si None (défaut)
+    @param n nombre d'exécutions par étape, 3 par défaut
+    @param fichOut fichier JSON des mesures (référence pour fichBase), "" (défaut) sans écriture
+    @param fichBase fichier JSON de référence, "" (défaut) sans comparaison
+    @param tol tolérance relative sur le temps et la mémoire, 0.25 par défaut
+    @return les mesures {config:{étape:{"t","rate","mem"}}} et la liste des régressions (config,étape,grandeur,valeur,référence)
+    """
+    import platform
+    if config is None:
+        config=[next(c for c in all_config() if c[0]==FFT) for FFT in (1024,2048,4096,8192,16384,32768)]
+    def meas(f):
+        t=[]
+        for i in range(n):
+            t0=time.perf_counter()
+            r=f()
+            t.append(time.perf_counter()-t0)
+        tracemalloc.start()
+        f()
+        mem=tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return r,min(t),mem
+    res={}
+    for c in config:
+        key=" ".join(str(i) for i in c)
+        p=Param(*c,seed=0)
+        p.update()
+        x,y=noise_mode(p)
+        st={}
+        g,st["Grid"],st["Grid mem"]=meas(lambda:Grid(p,cache=False))
+        s,st["Signal"],st["Signal mem"]=meas(lambda:Signal(g,rng=0))
+        e,st["add_target"],st["add_target mem"]=meas(lambda:Signal(g,mat=s.mat,t=s.t).add_target(d=45,D=5))
+        e=Signal(g,mat=s.mat,t=s.t)
+        e.add_target(d=45,D=5)
+        _,st["add_noise"],st["add_noise mem"]=meas(lambda:Signal(g,mat=e.mat,t=e.t,rng=0).add_noise(SNR=3))
+        e.add_noise(SNR=3,rng=0)
+        for OFDM,FA in sweepRx:
+            k=f'Rdm {"OFDM" if OFDM==True else "random"} {FA}'
+            r,st[k],st[k+" mem"]=meas(lambda:Rdm(e,wind="CHE",beta=80,FA=FA,OFDM=OFDM,symbSize=x,carrierSize=y,SNR=3))
+            if OFDM==True and FA=='MF':
+                rOFDM=r
+        _,st["pislr"],st["pislr mem"]=meas(lambda:rOFDM.pislr(x0=5,y0=45,dx=5,dy=5))
+        _,st["pislrTheo"],st["pislrTheo mem"]=meas(lambda:rOFDM.pislrTheo(SNR=3,D=5,d=45))
+        N=len(s.t)
+        res[key]={k:{"t":st[k],"rate":N/st[k],"mem":st[k+" mem"]} for k in st if not k.endswith(" mem")}
+        for k,v in res[key].items():
+            print(f'{key:28} {k:16} {1e3*v["t"]:10.2f} ms {v["rate"]/1e6:10.2f} Méch/s {v["mem"]/2**20:9.1f} Mo')
+    reg=[]
+    if fichBase!="":
+        with open(fichBase) as f:
+            base=json.load(f)["results"]
+        for key,v in res.items():
+            for k,m in v.items():
+                for q in ("t","mem"):
+                    if key in base and k in base[key] and m[q]>(1+tol)*base[key][k][q]:
+                        reg.append((key,k,q,m[q],base[key][k][q]))
+                        print(f'régression {key} {k} {q} : {m[q]:.4g} > {base[key][k][q]:.4g} (+{100*tol:.0f}%)')
+        if len(reg)==0:
+            print(f'pas de régression par rapport à {fichBase}')
+    if fichOut!="":
+        with open(fichOut,"w") as f:
+            json.dump({"version":__version__,"numpy":np.__version__,"python":platform.python_version(),"machine":platform.machine(),"fft":_fftConf["lib"],"n":n,"results":res},f,indent=1)
+    return res,reg
 
 def noise_mode(p,nbCarrier=1000):
     """
@@ -710,12 +1670,340 @@ def noise_mode(p,nbCarrier=1000):
         y=p.LF/2
     return int(l/y), int(y)
 
-def simul(sim=-1,config=all_config(),fichOut="test.txt",SNR=[3],D=[0],d=[0],newFile=False):
+def check_prec(config=((1024,1/16,"PP4","CP1","QPSK"),(32768,1/8,"PP2","CP1","QPSK")),SNR=3,D=5,d=45,tol=0.01,seed=0):
+    """
+    @brief Vérification du mode précision simple (Param(prec="single")) par rapport à la précision double
+    @details Même trame, même cible et même réalisation du bruit dans les deux précisions, PSLR et ISLR (avec et sans la ligne x0) des 6 récepteurs de simul(sim=4). L'écart constaté est de l'ordre de 1e-3 dB, la tolérance est de 0.01 dB
+    @param config les configurations testées
+    @param SNR,D,d le SNR en dB, le Doppler et le retard de la cible
+    @param tol l'écart max. toléré en dB
+    @param seed la graine (cf. seed_seq), -1 pour une nouvelle entropie tirée une fois, commune aux deux précisions
+    @return l'écart max. en dB
+    """
+    lconf=((True,'MF'),(True,'ZF'),(True,'WF'),(False,'MF'),(False,'ZF'),(False,'WF'))
+    seed=seed_seq(seed)
+    err=0
+    for n,data in enumerate(config):
+        out=[]
+        for prec in ("double","single"):
+            p=Param(*data,seed=seed_child(seed,n),prec=prec)
+            p.update()
+            b=Signal(Grid(p))
+            b.add_target(d=d,D=D)
+            b.add_noise(SNR=SNR,noise=rng_of(seed_child(seed,n,0)).standard_normal(2*b.t.shape[0]).view(complex))
+            x,y=noise_mode(p)
+            out.append([Rdm(b,OFDM=c[0],wind="CHE",beta=80,FA=c[1],symbSize=x,carrierSize=y,SNR=SNR).pislr(dB=True,dx=5,dy=5,x0=D,y0=d) for c in lconf])
+        e=np.max(np.abs(np.array(out[0])-np.array(out[1])))
+        print(f'{data} écart max. {e:.2e} dB')
+        err=max(err,e)
+    print(f'écart max. {err:.2e} dB ' + ('<=' if err<=tol else '>') + f' {tol} dB')
+    return err
+
+# récepteurs (OFDM,FA) des balayages
+sweepRx=((True,'MF'),(True,'ZF'),(True,'WF'),(False,'MF'),(False,'ZF'),(False,'WF'))
+
+def sweep(p,SNR=[3],D=[0],d=[0],lconf=sweepRx,wind="CHE",beta=80,symbSize=0,carrierSize=0,rng=None,points=None):
+    """
+    @brief Balayage SNR x D x d d'une configuration avec nombres aléatoires communs
+    @details La trame émise et une réalisation du bruit de variance unitaire sont tirées une seule fois, chaque point ne refait que l'ajout de la cible (une fois par couple (D,d)) et la mise à l'échelle du bruit (par SNR)
+    @param p instance Param mise à jour
+    @param SNR,D,d les listes des SNR en dB, des Dopplers et des retards
+    @param lconf les récepteurs, couples (OFDM,FA)
+    @param wind,beta,symbSize,carrierSize les paramètres des Rdm, cf. Rdm
+    @param rng générateur pseudo-aléatoire ou graine (cf. rng_of), p.rng par défaut
+    @param points liste des points (SNRi,Di,di) à calculer à la place du produit SNR x D x d, None par défaut
+    @return la liste des (SNRi,Di,di,out) dans l'ordre SNR, D puis d (ou celui de points), avec out les couples (pslr,pslrTheo) en dB des récepteurs de lconf
+    """
+    if points is None:
+        PARAM=np.array([np.kron(SNR,np.kron(np.ones(len(D)),np.ones(len(d)))),
+                        np.kron(np.ones(len(SNR)),np.kron(D,np.ones(len(d)))),
+                        np.kron(np.ones(len(SNR)),np.kron(np.ones(len(D)),d))])
+    else:
+        PARAM=np.array(points,dtype=float).reshape(-1,3).T
+    b=Signal(Grid(p),rng=rng)
+    noise=b.rng.standard_normal(2*b.t.shape[0],dtype=p.rdtype).view(p.dtype)
+    # plans des récepteurs, les filtres sont calculés une fois pour la trame émise
+    plans=[RdmPlan(p,wind=wind,beta=beta,FA=FA,OFDM=OFDM,symbSize=symbSize,carrierSize=carrierSize) for OFDM,FA in lconf]
+    res=[None]*PARAM.shape[1]
+    # points regroupés par cible, dans l'ordre de première apparition
+    tgt={}
+    for j,(SNRi,Di,di) in enumerate(PARAM.T):
+        tgt.setdefault((Di,di),[]).append(j)
+    for (Di,di),lj in tgt.items():
+        e=Signal(b.g,mat=b.mat,t=b.t,rng=b.rng)
+        e.add_target(d=di,D=Di)
+        for j in lj:
+            SNRi=PARAM[0,j]
+            c=Signal(e.g,mat=e.mat,t=e.t,rng=e.rng)
+            c.add_noise(SNR=SNRi,noise=noise)
+            out=()
+            for (OFDM,FA),r in zip(lconf,rdm_batch(c,plans,SNR=SNRi)):
+                print(f'SNR={SNRi} D={Di} d={di} OFDM={OFDM} {FA}',end='')
+                pslr=r.pislr(dB=True,dx=5,dy=5,x0=int(Di),y0=int(di))[0]
+                pslrTheo=r.pislrTheo(SNR=SNRi,FA=FA,D=Di,d=di,OFDM=OFDM,dB=True)[0]
+                print(f' {pslr:.2f} {pslrTheo:.2f}')
+                out=out+(pslr,pslrTheo)
+            res[j]=(SNRi,Di,di,out)
+    return res
+
+# récepteurs de simul par mode : (fenêtre,dimensions radar à bruit,récepteurs (OFDM,FA) de sweep) pour 2 et 4, (fenêtre,OFDM,FA,ZP) pour 3
+simulRx={2:("NULL",(2230,1024),sweepRx),
+         3:(('NUL',True,'MF',False),
+            ('CHE',True,'MF',False),
+            ('CHE',True,'MF',True),
+            ('CHE',True,'ZF',False),
+            ('CHE',False,'MF',False),
+            ('CHE',False,'ZF',False)),
+         4:("CHE","noise_mode",sweepRx)}
+
+def simul_columns(sim,mc=False):
+    """
+    @brief Colonnes (nom,type) des résultats de simul
+    @param sim le mode de simul, 3 ou balayage 2 et 4
+    @param mc avec les colonnes du mode Monte Carlo (écarts-types std_* des grandeurs simulées, nbre de tirages trials), False par défaut
+    @return la liste des colonnes, configuration puis grandeurs par récepteur (nommé fenêtre_OFDM|random_FA[_ZP] pour 3, OFDM|random_FA pour 2 et 4)
+    """
+    col=[("LF","<i8"),("FFT","<i8"),("GI","<f8"),("PP","S4"),("CP","S4"),("MOD","S8"),("x","<i8"),("y","<i8")]
+    if sim==3:
+        for wind,OFDM,FA,ZP in simulRx[3]:
+            rx=f'{wind}_{"OFDM" if OFDM==True else "random"}_{FA}{"_ZP" if ZP==True else ""}'
+            col+=[(f'{q}_{rx}',"<f8") for q in ("pslr","islr","pslrm","islrm")]
+    else:
+        col+=[("SNR","<f8"),("D","<f8"),("d","<f8")]
+        for OFDM,FA in simulRx[sim][2]:
+            rx=f'{"OFDM" if OFDM==True else "random"}_{FA}'
+            col+=[(f'pslr_{rx}',"<f8"),(f'pslrTheo_{rx}',"<f8")]
+    if mc==True:
+        col+=[("std_"+i,dt) for i,dt in col if i.split("_")[0] in ("pslr","islr","pslrm","islrm")]+[("trials","<i8")]
+    return col
+
+class Store():
+    """@brief Stockage en colonnes des résultats de simul : répertoire .col avec schema.json (version, mode, colonnes) et un fichier binaire par colonne, index sur la configuration"""
+    version=1
+    index=("FFT","GI","PP","CP","MOD")
+
+    def __init__(self,path,sim=None,mc=False):
+        """
+        @brief Ouverture ou création (si sim est donné) du stockage
+        @param path le répertoire .col
+        @param sim le mode de simul, pour la création, None par défaut
+        @param mc colonnes du mode Monte Carlo, pour la création, False par défaut
+        @return col attribut les colonnes, dictionnaire nom -> np.memmap en lecture
+        @return schema attribut le schéma
+        """
+        self.path=path
+        fich=os.path.join(path,"schema.json")
+        if os.path.isfile(fich):
+            with open(fich) as f:
+                self.schema=json.load(f)
+            if self.schema["version"]!=Store.version or (sim is not None and (self.schema["sim"]!=sim or self.schema.get("mc",False)!=mc)):
+                raise ValueError(f"{path} : schéma {self.schema['version']} sim={self.schema['sim']} incompatible")
+        else:
+            if sim is None:
+                raise FileNotFoundError(fich)
+            os.makedirs(path,exist_ok=True)
+            self.schema={"version":Store.version,"sim":sim,"mc":mc,"columns":simul_columns(sim,mc)}
+            with open(fich,"w") as f:
+                json.dump(self.schema,f)
+            for name,_ in self.schema["columns"]:
+                open(os.path.join(path,name+".bin"),"ab").close()
+        self.load()
+
+    @staticmethod
+    def from_text(fichIn,sim=None):
+        """
+        @brief Stockage en mémoire à partir d'un fichier texte de simul, lu une seule fois
+        @param fichIn le fichier texte
+        @param sim le mode de simul, déduit du nombre de colonnes (avec ou sans Monte Carlo) si None (défaut)
+        @return l'instance Store (path None)
+        """
+        with open(fichIn) as f:
+            data=[i.split() for i in f.read().split('\n') if i.strip()]
+        mc=len(data[0]) in (len(simul_columns(3,True)),len(simul_columns(4,True)))
+        if sim is None:
+            sim=3 if len(data[0]) in (len(simul_columns(3)),len(simul_columns(3,True))) else 4
+        s=Store.__new__(Store)
+        s.path=None
+        s.schema={"version":Store.version,"sim":sim,"mc":mc,"columns":simul_columns(sim,mc)}
+        s.col={name:np.array([i[j] for i in data],dtype=dt) for j,(name,dt) in enumerate(s.schema["columns"])}
+        s.make_index()
+        return s
+
+    def load(self):
+        """@brief Projection en mémoire des colonnes et index"""
+        self.col={}
+        for name,dt in self.schema["columns"]:
+            fich=os.path.join(self.path,name+".bin")
+            n=os.path.getsize(fich)//np.dtype(dt).itemsize
+            self.col[name]=np.memmap(fich,dtype=dt,mode="r",shape=(n,)) if n>0 else np.empty(0,dtype=dt)
+        self.make_index()
+
+    def make_index(self):
+        """@brief Index configuration (FFT,GI,PP,CP,MOD) -> numéros de lignes"""
+        n=len(self)
+        self.idx={}
+        if n>0:
+            keys=list(zip(*(self.col[i].tolist() for i in Store.index)))
+            for i,k in enumerate(keys):
+                self.idx.setdefault(k,[]).append(i)
+            self.idx={k:np.array(v) for k,v in self.idx.items()}
+
+    def __len__(self):
+        return len(self.col[self.schema["columns"][0][0]])
+
+    def __getitem__(self,name):
+        return self.col[name]
+
+    def append(self,rows):
+        """
+        @brief Ajout de lignes de résultats (tuples dans l'ordre des colonnes) et rechargement
+        @param rows la liste des lignes
+        """
+        for j,(name,dt) in enumerate(self.schema["columns"]):
+            with open(os.path.join(self.path,name+".bin"),"ab") as f:
+                f.write(np.array([r[j] for r in rows],dtype=dt).tobytes())
+        self.load()
+
+    def select(self,**crit):
+        """
+        @brief Lignes des configurations sélectionnées
+        @param crit critères sur FFT, GI, PP, CP, MOD, valeur ou liste de valeurs, ex. MOD="QPSK", FFT=(1024,2048)
+        @return les numéros de lignes, croissants
+        """
+        crit={k:tuple(np.atleast_1d(v).tolist()) for k,v in crit.items()}
+        crit={c:tuple(i.encode() if isinstance(i,str) else i for i in v) for c,v in crit.items()}
+        rows=[r for k,r in self.idx.items() if all(k[Store.index.index(c)] in v for c,v in crit.items())]
+        return np.sort(np.concatenate(rows)) if len(rows)>0 else np.empty(0,dtype=int)
+
+def config_seed(seed,data,*key):
+    """
+    @brief Graine fille de la configuration data, repérée par une empreinte de (FFT,GI,PP,CP,MOD) et non par sa place dans la liste des configurations
+    @param seed graine mère, cf. seed_seq
+    @param data la configuration (FFT,GI,PP,CP,MOD)
+    @param key indices entiers suivants, cf. seed_child
+    @return instance np.random.SeedSequence
+    """
+    FFT,GI,PP,CP,MOD=data
+    h=hashlib.sha1(repr((int(FFT),float(GI),str(PP),str(CP),str(MOD))).encode()).hexdigest()
+    return seed_child(seed,int(h[:16],16),*key)
+
+def simul_key(sim,data,point,seed,mc=None):
+    """
+    @brief Clé du cache des résultats de simul, empreinte de (config, sim, point, récepteurs, graine, flux par config. (config_seed), version[, mode Monte Carlo])
+    @param sim le mode de simul
+    @param data la configuration (FFT,GI,PP,CP,MOD)
+    @param point le point (SNRi,Di,di) d'un balayage, None pour sim=3
+    @param seed la graine mère, SeedSequence
+    @param mc le mode Monte Carlo (trials,ciWidth,minTrials), None (défaut) pour un seul tirage
+    @return la clé, chaîne hexadécimale
+    """
+    FFT,GI,PP,CP,MOD=data
+    k=((int(FFT),float(GI),str(PP),str(CP),str(MOD)),sim,None if point is None else tuple(float(i) for i in point),simulRx.get(sim),seed.entropy,seed.spawn_key,"config_seed",__version__)
+    if mc is not None:
+        k=k+(tuple(float(i) for i in mc),)
+    return hashlib.sha1(repr(k).encode()).hexdigest()
+
+def simul_task(sim,n,data,points=None,seed=None,mc=None):
+    """
+    @brief Calcul d'une configuration (ou de points de son balayage) pour simul
+    @details La configuration utilise le flux config_seed(seed,data) : le résultat ne dépend ni du processus, ni de l'ordre d'exécution, ni de la place de la configuration dans la liste, des points d'un balayage redonnent les mêmes valeurs que le balayage complet (nombres aléatoires communs)
+    En mode Monte Carlo, le tirage k>0 (trame, bruit) utilise config_seed(seed,data,k), les tirages d'un point s'arrêtent dès que la largeur de l'intervalle de confiance à 95 % (1.96 écart-type de la moyenne de part et d'autre) de chacune de ses grandeurs simulées, en dB, est inférieure à ciWidth, après minTrials tirages, ou à trials tirages
+    @param sim cf. simul
+    @param n,data le numéro et la configuration (FFT,GI,PP,CP,MOD)
+    @param points liste des points (SNRi,Di,di) des balayages 2 et 4
+    @param seed la graine mère, SeedSequence
+    @param mc le mode Monte Carlo (trials,ciWidth,minTrials), None (défaut) pour un seul tirage
+    @return la liste des lignes de résultats (tuples), une par point, pour sim=0 les gains OFDM et random et m', en mode Monte Carlo les grandeurs simulées sont les moyennes et sont suivies des écarts-types et du nbre de tirages (cf. simul_columns)
+    """
+    FFT,GI,PP,CP,MOD=data
+    print(f'{n} FFT={FFT} GI={GI} {PP} {CP} {MOD} ',end='')
+    _prof["key"]=f'sim={sim} {FFT} {GI} {PP} {CP} {MOD}'
+    with _stage("Param"):
+        p=Param(FFT,GI,PP,CP,MOD,seed=config_seed(seed,data))
+        p.update()
+    def run(k,pts):
+        # lignes des points pts pour le tirage k
+        rows=[]
+        rng=config_seed(seed,data) if k==0 else config_seed(seed,data,k)
+        if sim==2 or sim==4:
+            wind,xy,lconf=simulRx[sim]
+            x,y=noise_mode(p) if xy=="noise_mode" else xy
+            print('')
+            for SNRi,Di,di,out in sweep(p,lconf=lconf,wind=wind,symbSize=x,carrierSize=y,rng=rng,points=pts):
+                rows.append((p.LF,FFT,GI,PP,CP,MOD,x,y,SNRi,Di,di)+tuple(out))
+        if sim==3:
+            b=Signal(Grid(p)) if k==0 else Signal(Grid(p),rng=rng)
+            x,y=noise_mode(p)
+            b.add_target(d=0,D=0);
+            b.add_noise(SNR=3)
+            out=()
+            for r in rdm_batch(b,[(c[2],c[0],c[3],c[1]) for c in simulRx[3]],beta=80,symbSize=x,carrierSize=y):
+                pislr=r.pislr(dB=True,dx=5,dy=5,x0=0,y0=0)
+                out=out+pislr
+            rows=[(p.LF,FFT,GI,PP,CP,MOD,x,y)+out]
+        return rows
+    rows=[]
+    if sim==0:
+        x,y=noise_mode(p)
+        print(f'LF={p.LF}, {x}x{y} {10*np.log10(p.FFT*p.LF):.2f} {10*np.log10(x*y):.2f}',end='')
+        rows=[(10*np.log10(p.FFT*p.LF),10*np.log10(x*y),y)]
+    if sim in (2,3,4):
+        if mc is None:
+            rows=run(0,points)
+        else:
+            trials,ciWidth,minTrials=mc
+            pts=[None] if points is None else points
+            col=[i for i,(name,_) in enumerate(simul_columns(sim)) if name.split("_")[0] in ("pslr","islr","pslrm","islrm")]
+            acc=[[] for i in pts]
+            act=list(range(len(pts)))
+            for k in range(int(trials)):
+                for i,r in zip(act,run(k,None if points is None else [pts[i] for i in act])):
+                    acc[i].append(r)
+                if k+1>=minTrials:
+                    act=[i for i in act if 2*1.96*np.max(np.std([[r[j] for j in col] for r in acc[i]],axis=0,ddof=1))/np.sqrt(k+1)>=ciWidth]
+                if len(act)==0:
+                    break
+            for a in acc:
+                v=np.array([[r[j] for j in col] for r in a])
+                row=list(a[0])
+                for j,m in zip(col,v.mean(axis=0)):
+                    row[j]=float(m)
+                rows.append(tuple(row)+tuple(float(i) for i in (v.std(axis=0,ddof=1) if len(a)>1 else np.zeros(len(col))))+(len(a),))
+    if sim==5:
+        pass
+    print('')
+    return rows
+
+def _simul_run(task):
+    """@brief Exécution d'une tâche (clé d'ordre,clés du cache,arguments de simul_task) dans un processus de simul, avec ses mesures de profilage"""
+    rows=simul_task(*task[2])
+    data,_prof["data"]=_prof["data"],{}
+    return task[0],task[1],rows,data
+
+def _simul_init(lib,profile):
+    """@brief Initialisation d'un processus de simul : FFT mono-thread, profilage"""
+    fft_backend(lib,1)
+    if profile>0:
+        profile_start(profile>1)
+
+def simul(sim=-1,config=None,fichOut="test.txt",SNR=[3],D=[0],d=[0],newFile=False,seed=-1,workers=1,maxTasks=4,fichCache="",profile=0,fichProf="",trials=1,ciWidth=0.,minTrials=3):
     # 0 configuration OFDM et NOISE avec paramètres et gain de traitement
     # 1 affichage des grilles temps-fréquence
     # 2 affichage RDM de base
     # 3 calcul PISLR pour config
     # 4 calcul PISLR vs retard et Doppler, config
+    # seed graine mère (cf. seed_seq), flux indépendant par config. (config_seed(seed,data)), partagé par les points d'un balayage (cf. sweep)
+    # workers nbre de processus (cf. simul_task), les tâches les plus coûteuses d'abord, les points des balayages 2 et 4 répartis en workers parts,
+    #   chaque processus est renouvelé après maxTasks tâches, les lignes sont écrites dans l'ordre du calcul série
+    #   (appel sous if __name__=="__main__": hors Linux)
+    # fichOut fichier texte, ou stockage en colonnes si le nom se termine par .col (cf. Store)
+    # fichCache base sqlite des résultats par point (clé simul_key), reprise d'une simulation interrompue ou extension d'un balayage
+    #   sans refaire les points déjà calculés (graine fixée), "" (défaut) sans cache
+    # profile 1 pour le profilage des étapes (temps), 2 avec les pics mémoire (tracemalloc), 0 (défaut) sans, tableau par config. et par mode en fin de calcul
+    #   fichProf fichier JSON du rapport de profilage (cf. profile_report)
+    # trials nbre maximal de tirages Monte Carlo par point des modes 2, 3 et 4 (1 par défaut, un seul tirage), arrêt dès que l'intervalle de confiance
+    #   à 95 % de chaque PSLR/ISLR simulé est plus étroit que ciWidth dB, après au moins minTrials tirages (cf. simul_task),
+    #   moyennes puis écarts-types et nbre de tirages en sortie (cf. simul_columns)
     
     # toutes les config
     #config=all_config()
@@ -729,116 +2017,106 @@ def simul(sim=-1,config=all_config(),fichOut="test.txt",SNR=[3],D=[0],d=[0],newF
     #config=[i for i in all_config() if i[2] in ("PP7","PP8") and i[3] in 'CP4' and i[4] in "QPSK"]
     # configuration 32K
 
-    n=0
+    if config is None:
+        config=all_config()
+    seed=seed_seq(seed)
+    mc=(int(trials),float(ciWidth),max(2,int(minTrials))) if trials>1 else None
+    prof={}
+    if profile>0:
+        profile_start(profile>1)
     if sim==0:
         out=[np.Inf,-np.Inf,np.Inf,-np.Inf,np.Inf,-np.Inf]
     if newFile==True:
         if os.path.isfile(fichOut):
             os.remove(fichOut)
-    for data in config:
-        FFT,GI,PP,CP,MOD=data
-        print(f'{n} FFT={FFT} GI={GI} {PP} {CP} {MOD} ',end='')
-        p=Param(FFT,GI,PP,CP,MOD)
-        p.update()
-        if sim==0:
-            x,y=noise_mode(p)
-            print(f'LF={p.LF}, {x}x{y} {10*np.log10(p.FFT*p.LF):.2f} {10*np.log10(x*y):.2f}',end='')
-            out=[min(out[0],10*np.log10(p.FFT*p.LF)),max(out[1],10*np.log10(p.FFT*p.LF)),min(out[2],10*np.log10(x*y)),max(out[3],10*np.log10(x*y)),min(out[4],y),max(out[5],y)]
-        if sim==2:
-            PARAM=np.array([np.kron(SNR,np.kron(np.ones(len(D)),np.ones(len(d)))),
-                            np.kron(np.ones(len(SNR)),np.kron(D,np.ones(len(d)))),
-                            np.kron(np.ones(len(SNR)),np.kron(np.ones(len(D)),d))])
-            print('')
-            for var in PARAM.T:
-                SNRi,Di,di=var
-                b=Signal(Grid(p))
-                x=2230
-                y=1024
-                b.add_target(d=di,D=Di)
-                b.add_noise(SNR=SNRi)
-                lconf=((True,'MF'),
-                       (True,'ZF'),
-                       (True,'WF'),
-                       (False,'MF'),
-                       (False,'ZF'),
-                       (False,'WF'))
-                out=()
-                for c in lconf:
-                    OFDM=c[0]
-                    FA=c[1]
-                    print(f'SNR={SNRi} D={Di} d={di} OFDM={OFDM} {FA}',end='')
-                    r=Rdm(b,OFDM=OFDM,wind="NULL",beta=80,FA=FA,symbSize=x,carrierSize=y,SNR=SNRi)
-                    pslr=r.pislr(dB=True,dx=5,dy=5,x0=int(Di),y0=int(di))[0]
-                    pslrTheo=r.pislrTheo(SNR=SNRi,FA=FA,D=Di,d=di,OFDM=OFDM,dB=True)[0]
-                    print(f' {pslr:.2f} {pslrTheo:.2f}')
-                    out=out+(pslr,pslrTheo)
-                with open(fichOut,"a") as f:
-                    f.write(f'{p.LF} {FFT} {GI} {PP} {CP} {MOD} {x} {y} {SNRi} {Di} {di}')
-                    for i in out:
-                        f.write(f' {i}')
-                    f.write('\n')
-        if sim==3:
-            b=Signal(Grid(p))
-            x,y=noise_mode(p)
-            b.add_target(d=0,D=0);
-            b.add_noise(SNR=3)
-            lconf=(('NUL',True,'MF',False),
-                  ('CHE',True,'MF',False),
-                  ('CHE',True,'MF',True),
-                  ('CHE',True,'ZF',False),
-                  ('CHE',False,'MF',False),
-                  ('CHE',False,'ZF',False))
-            out=()
-            for c in lconf:
-                r=Rdm(b,wind=c[0],beta=80,OFDM=c[1],carrierSize=y,symbSize=x,FA=c[2],ZP=c[3])
-                pislr=r.pislr(dB=True,dx=5,dy=5,x0=0,y0=0)
-                out=out+pislr
-            with open(fichOut,"a") as f:
-                f.write(f"{p.LF} {FFT} {GI} {PP} {CP} {MOD} {x} {y}")
-                for i in out:
-                    f.write(f' {i}')
-                f.write('\n')
-        if sim==4:
-            PARAM=np.array([np.kron(SNR,np.kron(np.ones(len(D)),np.ones(len(d)))),
-                            np.kron(np.ones(len(SNR)),np.kron(D,np.ones(len(d)))),
-                            np.kron(np.ones(len(SNR)),np.kron(np.ones(len(D)),d))])
-            print('')
-            for var in PARAM.T:
-                SNRi,Di,di=var
-                b=Signal(Grid(p))
-                x,y=noise_mode(p)
-                b.add_target(d=di,D=Di)
-                b.add_noise(SNR=SNRi)
-                lconf=((True,'MF'),
-                       (True,'ZF'),
-                       (True,'WF'),
-                       (False,'MF'),
-                       (False,'ZF'),
-                       (False,'WF'))
-                out=()
-                for c in lconf:
-                    OFDM=c[0]
-                    FA=c[1]
-                    print(f'SNR={SNRi} D={Di} d={di} OFDM={OFDM} {FA}',end='')
-                    r=Rdm(b,OFDM=OFDM,wind="CHE",beta=80,FA=FA,symbSize=x,carrierSize=y,SNR=SNRi)
-                    pslr=r.pislr(dB=True,dx=5,dy=5,x0=int(Di),y0=int(di))[0]
-                    pslrTheo=r.pislrTheo(SNR=SNRi,FA=FA,D=Di,d=di,OFDM=OFDM,dB=True)[0]
-                    print(f' {pslr:.2f} {pslrTheo:.2f}')
-                    out=out+(pslr,pslrTheo)
-                with open(fichOut,"a") as f:
-                    f.write(f'{p.LF} {FFT} {GI} {PP} {CP} {MOD} {x} {y} {SNRi} {Di} {di}')
-                    for i in out:
-                        f.write(f' {i}')
-                    f.write('\n')
-        if sim==5:
-            pass
-        n=n+1
-        print('')
+        elif os.path.isdir(fichOut) and fichOut.endswith(".col"):
+            shutil.rmtree(fichOut)
+    store=Store(fichOut,sim,mc is not None) if fichOut.endswith(".col") and sim in (2,3,4) else None
+    # cache des résultats par point, les points déjà calculés ne sont pas refaits
+    db=None
+    # processus et base fermés aussi sur erreur ou interruption
+    pool=None
+    try:
+        if fichCache!="" and sim in (2,3,4):
+            db=sqlite3.connect(fichCache)
+            db.execute("create table if not exists points (key text primary key, row text)")
+        # tâches (clé d'ordre,arguments), coût estimé par le nbre d'échantillons de la trame, de points et de tirages
+        tasks,cost,keys,rows=[],[],[],[]
+        for n,data in enumerate(config):
+            FFT,GI,PP,CP,MOD=data
+            pts=[None]
+            if sim==2 or sim==4:
+                pts=list(zip(*(i.ravel() for i in np.meshgrid(np.asarray(SNR,dtype=float),np.asarray(D,dtype=float),np.asarray(d,dtype=float),indexing="ij"))))
+            keys.append([simul_key(sim,data,i,seed,mc) for i in pts])
+            rows.append({})
+            if db is not None:
+                for k in keys[n]:
+                    r=db.execute("select row from points where key=?",(k,)).fetchone()
+                    if r is not None:
+                        rows[n][k]=tuple(json.loads(r[0]))
+            miss=[i for i,k in enumerate(keys[n]) if k not in rows[n]]
+            if len(miss)==0:
+                continue
+            p=Param(FFT,GI,PP,CP,MOD)
+            p.update()
+            for k,part in enumerate(np.array_split(miss,min(workers,len(miss)) if workers>1 else 1)):
+                tasks.append(((n,k),[keys[n][i] for i in part],(sim,n,data,None if pts[0] is None else [pts[i] for i in part],seed,mc)))
+                cost.append(FFT*(1+GI)*p.LF*len(part)*(1 if mc is None else (mc[0]+mc[2])/2))
+        if workers>1 and len(tasks)>0:
+            pool=mp.Pool(min(workers,len(tasks)),_simul_init,(_fftConf["lib"],profile),maxTasks)
+            res=pool.imap_unordered(_simul_run,[tasks[i] for i in np.argsort(cost,kind="stable")[::-1]])
+        else:
+            res=map(_simul_run,tasks)
+        # écriture dans l'ordre des configurations dès qu'elles sont complètes
+        nxt=0
+        while True:
+            while nxt<len(config) and all(k in rows[nxt] for k in keys[nxt]):
+                if sim==0:
+                    g1,g2,y=rows[nxt][keys[nxt][0]]
+                    out=[min(out[0],g1),max(out[1],g1),min(out[2],g2),max(out[3],g2),min(out[4],y),max(out[5],y)]
+                elif store is not None:
+                    store.append([rows[nxt][k] for k in keys[nxt]])
+                elif sim in (2,3,4):
+                    with open(fichOut,"a") as f:
+                        for k in keys[nxt]:
+                            f.write(' '.join(f'{i}' for i in rows[nxt][k])+'\n')
+                nxt=nxt+1
+            if nxt==len(config):
+                break
+            key,lk,r,data=next(res)
+            profile_merge(prof,data)
+            rows[key[0]].update(zip(lk,r if len(r)>0 else [()]*len(lk)))
+            if db is not None:
+                db.executemany("insert or replace into points values (?,?)",[(k,json.dumps(i,default=float)) for k,i in zip(lk,r)])
+                db.commit()
+        if pool is not None:
+            pool.close()
+            pool.join()
+            pool=None
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        if db is not None:
+            db.close()
+        if profile>0:
+            profile_stop()
+    if profile>0:
+        profile_report(prof,fichProf)
     if sim==0:
         print(f"\n{out[0]:.1f} <= gain OFDM <= {out[1]:.1f}\n{out[2]:.1f} <= gain random <= {out[3]:.1f}\n{out[4]:d} <= m' <= {out[5]:d}")
     #return
 
+def result_load(fichIn):
+    """
+    @brief Lecture des résultats de simul, stockage en colonnes (répertoire .col) ou fichier texte (lu une seule fois)
+    @param fichIn le répertoire ou le fichier
+    @return l'instance Store
+    """
+    return Store(fichIn) if os.path.isdir(fichIn) else Store.from_text(fichIn)
+
 def result(res=0,fichIn="",fichOut=""):
+    import matplotlib.pyplot as plt
     if res==1:
         for MOD in ('QPSK','16QAM','64QAM','256QAM'):
             a=np.abs(fmod(MOD))
@@ -863,22 +2141,13 @@ def result(res=0,fichIn="",fichOut=""):
         b.show(dBmin=-20,unit="I",shift=True,view="3D")
         plt.show()
     if np.floor(res/10)==1:
-        c0=8
         if fichIn=="":
             print("Error fichIn empty abort")
             return
-        with open(fichIn) as f:
-            # suppression des lignes False
-            data=list(filter(None,f.read().split('\n')[0:]))
-        dataMod=[data[i] for i in range(len(data)) if data[i].split()[5]=='QPSK']
-        #y=[i.split()[c0+j] for i in data for j in np.arange(0,24,4)] # all PSLR 1
-        #y=[i.split()[7] for i in data if i.split()[1] in ("0.25","0.125")]
-        y=np.array([i.split()[c0+0] for i in dataMod],dtype=np.float32)
-        z=np.array([i.split()[c0+4] for i in dataMod],dtype=np.float32)
-        t=np.array([i.split()[c0+8] for i in dataMod],dtype=np.float32)
-        u=np.array([i.split()[c0+12] for i in dataMod],dtype=np.float32)
-        v=np.array([i.split()[c0+16] for i in dataMod],dtype=np.float32)
-        w=np.array([i.split()[c0+20] for i in dataMod],dtype=np.float32)
+        st=result_load(fichIn)
+        rx=[i[5:] for i,_ in st.schema["columns"] if i.startswith("pslr_")]
+        m=st.select(MOD="QPSK")
+        y,z,t,u,v,w=(np.asarray(st[f'pslr_{i}'][m],dtype=np.float32) for i in rx)
         plt.figure(dpi=300)
         if res==11:
             plt.plot(y,z,'y.',label='OFDM MF w/o CHE vs w/ CHE')
@@ -887,16 +2156,9 @@ def result(res=0,fichIn="",fichOut=""):
             plt.plot(z,v,'g.',label='CHE MF w/ OFDM vs w/ randon')
             vm=max(np.min((y,z)),np.min((z,t,u,v)));vM=min(np.max((y,z)),np.max((z,t,u,v)))
         elif res==14:
-            dataQPSK=[i.split()[c0:] for i in data if i.split()[5]=='QPSK']
-            data16QAM=[data[i].split()[c0:] for i in range(len(data)) if data[i].split()[5]=='16QAM']
-            data64QAM=[data[i].split()[c0:] for i in range(len(data)) if data[i].split()[5]=='64QAM']
-            data256QAM=[data[i].split()[c0:] for i in range(len(data)) if data[i].split()[5]=='256QAM']
-            #vv=np.array([0,4,8,12,16,20],dtype=int) # tout
-            vv=np.array([0,4,8,12,16],dtype=int) # sauf ZF nOFDM
-            y=np.array(dataQPSK,dtype=np.float32)[:,vv].reshape(-1)
-            z=np.array(data16QAM,dtype=np.float32)[:,vv].reshape(-1)
-            t=np.array(data64QAM,dtype=np.float32)[:,vv].reshape(-1)
-            u=np.array(data256QAM,dtype=np.float32)[:,vv].reshape(-1)
+            #vv=rx # tout
+            vv=rx[:5] # sauf ZF nOFDM
+            y,z,t,u=(np.stack([st[f'pslr_{i}'][st.select(MOD=MOD)] for i in vv],axis=1).astype(np.float32).reshape(-1) for MOD in ('QPSK','16QAM','64QAM','256QAM'))
             plt.plot(y,z,'b.',label='QPSK vs. 16QAM')
             plt.plot(y,t,'r.',label='QPSK vs. 64QAM')
             plt.plot(y,u,'g.',label='QPSK vs. 256QAM')
@@ -908,65 +2170,69 @@ def result(res=0,fichIn="",fichOut=""):
         plt.legend()
         plt.show()
     if res==20:
-        c0=8
         vec=0 # colonne 0-SNR, 1-D, 2-d
-        with open(fichIn) as f:
-            # suppression des lignes False
-            data=list(filter(None,f.read().split('\n')[0:]))
-        z=np.array([d.split()[c0:] for d in data],dtype=np.float32)
+        st=result_load(fichIn)
+        rx=[i[5:] for i,_ in st.schema["columns"] if i.startswith("pslr_")]
+        x=np.asarray(st[("SNR","D","d")[vec]],dtype=np.float32)
         plt.figure(dpi=300)
-        pltLegend=plt.plot(z[:,vec],z[:,3:15:2],'.') # simu 3,5,7/9,11,13 ; all 3:15:2
+        pltLegend=plt.plot(x,np.stack([st[f'pslr_{i}'] for i in rx],axis=1).astype(np.float32),'.') # simu
         plt.gca().set_prop_cycle(None)
-        pltLegend=pltLegend+plt.plot(z[:,vec],z[:,4:15:2],'--') # theo 4,6,8/10,12,14 ; all 4:15:2
+        pltLegend=pltLegend+plt.plot(x,np.stack([st[f'pslrTheo_{i}'] for i in rx],axis=1).astype(np.float32),'--') # theo
         plt.legend(pltLegend,('OFDM MF','OFDM ZF','OFDM WF','random MF','random ZF','random WF'),shadow=False,framealpha=.8)
         plt.grid(which='major')
         plt.xlabel("SNR [dB]")
         plt.ylabel("PSLR [dB]")
     if res==21:
         vec=2 # colonne 0-SNR, 1-D, 2-d
-        with open(fichIn) as f:
-            # suppression des lignes False
-            data=list(filter(None,f.read().split('\n')[0:]))
-        z=np.array([d.split() for d in data],dtype=np.float32)
+        st=result_load(fichIn)
+        rx=('OFDM_MF','OFDM_WF','random_MF','random_WF')
+        x=np.asarray(st[("SNR","D","d")[vec]],dtype=np.float32)
         plt.figure(dpi=300)
         plt.gca().set_prop_cycle(color=['tab:blue','tab:green','tab:red','tab:brown'])
         pltLegend=[]
-        pltLegend=plt.plot(z[:,vec],z[:,[3,7,9,13]],'.') # simu 3,5,7/9,11,13 ; all 3:15:2
+        pltLegend=plt.plot(x,np.stack([st[f'pslr_{i}'] for i in rx],axis=1).astype(np.float32),'.') # simu
         plt.gca().set_prop_cycle(color=['tab:blue','tab:green','tab:red','tab:brown'])
         #plt.gca().set_prop_cycle(None)
-        pltLegend=pltLegend+plt.plot(z[:,vec],z[:,[4,8,10,14]],'--') # theo 4,6,8/10,12,14 ; all 4:15:2
-        plt.legend(pltLegend,('OFDM MF','OFDM ZF','OFDM WF','random MF','random ZF','random WF'),shadow=False,framealpha=.8)
+        pltLegend=pltLegend+plt.plot(x,np.stack([st[f'pslrTheo_{i}'] for i in rx],axis=1).astype(np.float32),'--') # theo
+        plt.legend(pltLegend[:len(rx)],('OFDM MF','OFDM WF','random MF','random WF'),shadow=False,framealpha=.8)
         plt.grid(which='major')
-        plt.xlabel("SNR [dB]")
+        plt.xlabel("Retard [échant.]")
         plt.ylabel("PSLR [dB]")
     if res==23:
-        c0=11-2
         if fichIn=="":
             print("Error fichIn empty abort")
             return
-        with open(fichIn) as f:
-            # suppression des lignes False
-            data=list(filter(None,f.read().split('\n')[0:]))
-        z=np.array([d.split()[c0:] for d in data],dtype=np.float32)
+        st=result_load(fichIn)
+        rx=('OFDM_MF','OFDM_WF','random_MF','random_WF')
         plt.figure(dpi=300)
         plt.subplot(1,2,1)
-        plt.gca().set_prop_cycle(color=['tab:blue','tab:green','tab:red','tab:brown'])
-        plt.plot(z[0:21,0],z[0:21,[2,6,8,12]],'.-')
-        plt.gca().set_prop_cycle(color=['tab:blue','tab:green','tab:red','tab:brown'])
-        plt.plot(z[0:21,0],z[0:21,[3,7,9,13]],'--')
+        for q,sty in (('pslr','.-'),('pslrTheo','--')):
+            plt.gca().set_prop_cycle(color=['tab:blue','tab:green','tab:red','tab:brown'])
+            plt.plot(st["D"][0:21].astype(np.float32),np.stack([st[f'{q}_{i}'][0:21] for i in rx],axis=1).astype(np.float32),sty)
         plt.grid(which='major')
         plt.xlabel("Doppler [échant.]")
         plt.ylabel("PSLR [dB]")
         plt.ylim(11,54)
         plt.subplot(1,2,2)
-        plt.gca().set_prop_cycle(color=['tab:blue','tab:green','tab:red','tab:brown'])
-        plt.plot(z[21:42,1],z[21:42,[2,6,8,12]],'.-')
-        plt.gca().set_prop_cycle(color=['tab:blue','tab:green','tab:red','tab:brown'])
-        plt.plot(z[21:42,1],z[21:42,[3,7,9,13]],'--')
+        for q,sty in (('pslr','.-'),('pslrTheo','--')):
+            plt.gca().set_prop_cycle(color=['tab:blue','tab:green','tab:red','tab:brown'])
+            plt.plot(st["d"][21:42].astype(np.float32),np.stack([st[f'{q}_{i}'][21:42] for i in rx],axis=1).astype(np.float32),sty)
         plt.grid(which='major')
         plt.xlabel("retard [échant.]")
         plt.legend(('OFDM MF','OFDM WF','random MF','random WF'))
         plt.ylim(11,54)
+    if res==24:
+        # courbes théoriques seules (pislr_theo), sans simulation
+        a=Param();a.update()
+        x,y=noise_mode(a)
+        SNR=np.linspace(-10,20,61)
+        plt.figure(dpi=300)
+        for OFDM,FA in ((True,'MF'),(True,'ZF'),(True,'WF'),(False,'MF'),(False,'ZF'),(False,'WF')):
+            plt.plot(SNR,pislr_theo(SNR,0,0,*((a.LF,a.FFT) if OFDM==True else (x,y)),a.GI,a.FFT,a.MOD,FA,OFDM,dB=True)[0],'--')
+        plt.legend(('OFDM MF','OFDM ZF','OFDM WF','random MF','random ZF','random WF'),shadow=False,framealpha=.8)
+        plt.grid(which='major')
+        plt.xlabel("SNR [dB]")
+        plt.ylabel("PSLR [dB]")
     if fichOut!="":
         plt.savefig(fichOut)
     #return v